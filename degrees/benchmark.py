@@ -0,0 +1,193 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import degrees
+from graph import Graph
+
+"""
+Benchmarks for the degrees of separation search strategies.
+"""
+
+
+def count_expansions(function):
+    """
+    Wraps `function` so the number of calls made to it can be read
+    back from the wrapper's `calls` attribute.
+    """
+    def wrapper(*args, **kwargs):
+        wrapper.calls += 1
+        return function(*args, **kwargs)
+    wrapper.calls = 0
+    return wrapper
+
+
+def random_pairs(n, seed=None):
+    """
+    Returns `n` random (source, target) pairs of person ids.
+    """
+    rng = random.Random(seed)
+    person_ids = sorted(degrees.people)
+    return [tuple(rng.sample(person_ids, 2)) for _ in range(n)]
+
+
+def compare_searches(pairs, searches):
+    """
+    Runs every search on every pair, checking the strategies agree on
+    path length, and returns totals of nodes expanded and wall time.
+    """
+    results = {name: {"expanded": 0, "seconds": 0.0} for name in searches}
+    original = degrees.neighbors_for_person
+    try:
+        for source, target in pairs:
+            lengths = set()
+            for name, search in searches.items():
+                counter = count_expansions(original)
+                degrees.neighbors_for_person = counter
+                start = time.perf_counter()
+                path = search(source, target)
+                results[name]["seconds"] += time.perf_counter() - start
+                results[name]["expanded"] += counter.calls
+                lengths.add(None if path is None else len(path))
+            if len(lengths) != 1:
+                raise Exception(f"searches disagree on {source} -> {target}")
+    finally:
+        degrees.neighbors_for_person = original
+    return results
+
+
+def clear_data():
+    """
+    Empties the dictionaries filled by `load_data`.
+    """
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+
+
+def measure_load(load, reset=None):
+    """
+    Calls `load` and returns (result, seconds, bytes still allocated).
+
+    Tracing allocations slows loading down many times over, so `load`
+    is timed untraced and then called again under tracemalloc, after
+    calling `reset` (if given) to undo the first call before each run.
+    """
+    if reset:
+        reset()
+    start = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - start
+
+    if reset:
+        reset()
+    tracemalloc.start()
+    traced = load()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced
+    return result, seconds, allocated
+
+
+def compare_graphs(directory, n, seed=None):
+    """
+    Compares the memory and query throughput of the dict representation
+    filled by `load_data` against the integer-indexed `Graph`.
+    """
+    _, dict_load, dict_memory = measure_load(
+        lambda: degrees.load_data(directory), reset=clear_data
+    )
+    graph, graph_load, graph_memory = measure_load(
+        lambda: Graph.from_csv(directory)
+    )
+    pairs = random_pairs(n, seed)
+
+    start = time.perf_counter()
+    dict_paths = [degrees.shortest_path(source, target)
+                    for source, target in pairs]
+    dict_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph_paths = [graph.shortest_path_ids(source, target)
+                     for source, target in pairs]
+    graph_seconds = time.perf_counter() - start
+
+    for a, b in zip(dict_paths, graph_paths):
+        if (a is None) != (b is None) or (a and len(a) != len(b)):
+            raise Exception("representations disagree on path length")
+
+    return {
+        "dict": {"memory": dict_memory, "load": dict_load,
+                 "queries_per_second": n / dict_seconds},
+        "graph": {"memory": graph_memory, "load": graph_load,
+                  "queries_per_second": n / graph_seconds},
+    }
+
+
+def scaling(pairs, max_workers, search=degrees.shortest_path):
+    """
+    Returns the wall time of `shortest_paths` over `pairs`
+    for every pool size from 1 to `max_workers`.
+    """
+    times = {}
+    expected = None
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        paths = degrees.shortest_paths(pairs, workers=workers, search=search)
+        times[workers] = time.perf_counter() - start
+        lengths = [None if path is None else len(path) for path in paths]
+        if expected is None:
+            expected = lengths
+        elif lengths != expected:
+            raise Exception(f"{workers} workers returned different paths")
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark degrees searches.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("-n", "--pairs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--graph", action="store_true",
+                        help="compare the dict and integer graph representations")
+    parser.add_argument("--scaling", metavar="N", type=int,
+                        help="time shortest_paths with 1 to N workers")
+    args = parser.parse_args()
+
+    # Measure the searches themselves, not cache hits
+    degrees.configure_caches(neighbors=0, paths=0)
+
+    if args.graph:
+        results = compare_graphs(args.directory, args.pairs, args.seed)
+        for name, result in results.items():
+            print(f"  {name}: {result['memory'] / 2 ** 20:.1f} MiB, "
+                  f"loaded in {result['load']:.2f}s, "
+                  f"{result['queries_per_second']:.1f} queries/s")
+        return
+
+    print("Loading data...")
+    degrees.load_data(args.directory)
+    print("Data loaded.")
+
+    pairs = random_pairs(args.pairs, args.seed)
+    if args.scaling:
+        times = scaling(pairs, args.scaling)
+        print(f"{len(pairs)} random pairs")
+        for workers, seconds in times.items():
+            print(f"  {workers} workers: {seconds:.3f}s, "
+                  f"{times[1] / seconds:.2f}x speedup")
+        return
+
+    results = compare_searches(pairs, {
+        "bfs": degrees.shortest_path,
+        "bidirectional": degrees.bidirectional_shortest_path,
+    })
+    print(f"{len(pairs)} random pairs")
+    for name, result in results.items():
+        print(f"  {name}: {result['expanded']} nodes expanded, "
+              f"{result['seconds']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 # Shuyan Liu
 # CS50's Introduction to AI with Python 2020
 
+import argparse
 import csv
+import math
+import multiprocessing
+import os
 import sys
+from collections import deque
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import SNAPSHOT, Graph, fingerprint
+from util import LRUCache, Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -15,11 +21,35 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Default number of entries kept by the caches below
+NEIGHBOR_CACHE_SIZE = 10000
+PATH_CACHE_SIZE = 1000
+
+# Maps person_ids to their set of (movie_id, person_id) neighbors
+neighbor_cache = LRUCache(NEIGHBOR_CACHE_SIZE)
+
+# Maps unordered {source, target} pairs to (source, path) results
+path_cache = LRUCache(PATH_CACHE_SIZE)
+
 
 def load_data(directory):
     """
     Load data from CSV files into memory.
+
+    The parsed graph is cached in a binary snapshot next to the CSVs,
+    which later runs read instead while the CSVs are unchanged.
     """
+    # Cached neighbors and paths belong to whatever was loaded before
+    neighbor_cache.clear()
+    path_cache.clear()
+
+    filename = os.path.join(directory, SNAPSHOT)
+    sources = fingerprint(directory)
+    graph = Graph.load(filename, sources)
+    if graph is not None:
+        load_graph(graph)
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -48,30 +78,77 @@ def load_data(directory):
     with open(f"{directory}/stars.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            try:
+            # Skip stars of unknown people or movies, as snapshots do
+            if row["person_id"] in people and row["movie_id"] in movies:
                 people[row["person_id"]]["movies"].add(row["movie_id"])
                 movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+
+    Graph.from_dicts(people, movies).save(filename, sources)
+
+
+def load_graph(graph):
+    """
+    Fill `names`, `people` and `movies` from a `Graph`.
+    """
+    for i, person_id in enumerate(graph.person_ids):
+        name = graph.person_names[i]
+        start, end = graph.person_indptr[i], graph.person_indptr[i + 1]
+        people[person_id] = {
+            "name": name,
+            "birth": graph.births[i],
+            "movies": {graph.movie_ids[m] for m in graph.person_movies[start:end]}
+        }
+        names.setdefault(name.lower(), set()).add(person_id)
+
+    for i, movie_id in enumerate(graph.movie_ids):
+        start, end = graph.movie_indptr[i], graph.movie_indptr[i + 1]
+        movies[movie_id] = {
+            "title": graph.titles[i],
+            "year": graph.years[i],
+            "stars": {graph.person_ids[p] for p in graph.movie_people[start:end]}
+        }
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(description="Degrees of separation.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both source and target at once")
+    parser.add_argument("--compact", action="store_true",
+                        help="search an integer-indexed graph instead of dicts")
+    args = parser.parse_args()
+    directory = args.directory
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    if args.compact:
+        graph = Graph.from_directory(directory)
+        find_person = graph.person_id_for_name
+    else:
+        load_data(directory)
+        find_person = person_id_for_name
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = find_person(input("Name: "))
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = find_person(input("Name: "))
     if target is None:
         sys.exit("Person not found.")
-    path = shortest_path(source, target)
+
+    if args.compact:
+        # Search on indices, only looking names and titles up to print
+        source = graph.person_index[source]
+        path = graph.shortest_path(source, graph.person_index[target])
+        name_of = graph.person_names.__getitem__
+        title_of = graph.titles.__getitem__
+    else:
+        if args.bidirectional:
+            path = bidirectional_shortest_path(source, target)
+        else:
+            path = shortest_path(source, target)
+        name_of = lambda person_id: people[person_id]["name"]
+        title_of = lambda movie_id: movies[movie_id]["title"]
 
     if path is None:
         print("Not connected.")
@@ -80,9 +157,9 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = name_of(path[i][1])
+            person2 = name_of(path[i + 1][1])
+            movie = title_of(path[i + 1][0])
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -91,6 +168,20 @@ def shortest_path(source, target):
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If no possible path, returns None.
+    """
+    found, path = cached_path(source, target)
+    if not found:
+        path = breadth_first_search(source, target)
+        cache_path(source, target, path)
+    return path
+
+
+def breadth_first_search(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, found by breadth-first search.
+
     If no possible path, returns None.
     """
 
@@ -132,16 +223,318 @@ def shortest_path(source, target):
                 # Else continue and add the node to the frontier
                 frontier.add(child)
 
-    
-def person_id_for_name(name):
+
+def shortest_paths(pairs, workers=None, search=shortest_path):
+    """
+    Returns the shortest path for every (source, target) pair, in order,
+    spreading the searches over a pool of `workers` processes.
+
+    Workers are forked so they share the loaded `people` and `movies`
+    copy-on-write instead of loading the data again. Where fork is not
+    available the searches run in this process.
+    """
+    pairs = list(pairs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        workers = 1
+    if workers == 1 or len(pairs) < 2:
+        return [search(source, target) for source, target in pairs]
+
+    # Several pairs per task keep the pool's messaging overhead low
+    chunksize = max(1, len(pairs) // (workers * 4))
+    with context.Pool(workers) as pool:
+        return pool.starmap(search, pairs, chunksize)
+
+
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, growing one search
+    from each end and stopping once the two searches meet.
+
+    If no possible path, returns None.
+    """
+    found, path = cached_path(source, target)
+    if not found:
+        path = bidirectional_search(source, target)
+        cache_path(source, target, path)
+    return path
+
+
+def bidirectional_search(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, found by breadth-first search from both ends.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to (movie_id, person_id) of the step
+    # back towards the side's starting person, plus its depth
+    forward = {source: None}
+    backward = {target: None}
+    forward_depth = {source: 0}
+    backward_depth = {target: 0}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # Expand one whole level of the smaller frontier
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, parents, depth = forward_frontier, forward, forward_depth
+            other, other_depth = backward, backward_depth
+        else:
+            frontier, parents, depth = backward_frontier, backward, backward_depth
+            other, other_depth = forward, forward_depth
+
+        next_frontier = []
+        meeting = None
+        best = None
+        for person_id in frontier:
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie_id, person_id)
+                depth[neighbor] = depth[person_id] + 1
+                next_frontier.append(neighbor)
+                # Finish the level so the shortest meeting point is kept
+                if neighbor in other:
+                    length = depth[neighbor] + other_depth[neighbor]
+                    if best is None or length < best:
+                        meeting, best = neighbor, length
+
+        if meeting is not None:
+            return join_paths(forward, backward, meeting)
+
+        if frontier is forward_frontier:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
+
+
+def cached_path(source, target):
+    """
+    Looks up a completed search between source and target in either
+    direction. Returns (found, path), where path may be None.
+    """
+    entry = path_cache.get(frozenset((source, target)))
+    if entry is None:
+        return False, None
+    cached_source, path = entry
+    if path is None:
+        return True, None
+    # Paths are symmetric, so a cached reverse search can be turned round
+    if cached_source != source:
+        return True, reverse_path(cached_source, path)
+    return True, list(path)
+
+
+def cache_path(source, target, path):
+    """
+    Remembers the result of a search between source and target.
+    """
+    path_cache.put(frozenset((source, target)), (source, path))
+
+
+def configure_caches(neighbors=None, paths=None):
+    """
+    Resizes the neighbor and path caches. A size of 0 disables a cache.
+    """
+    if neighbors is not None:
+        neighbor_cache.resize(neighbors)
+    if paths is not None:
+        path_cache.resize(paths)
+
+
+def cache_info():
+    """
+    Returns the hit and miss counts and sizes of the neighbor and path caches.
+    """
+    return {"neighbors": neighbor_cache.info(), "paths": path_cache.info()}
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Returns the (movie_id, person_id) path from the source through
+    `meeting` to the target, given the parent links of both searches.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def distances_from(source):
+    """
+    Runs one breadth-first search from `source` over everyone reachable.
+
+    Returns a (distance, parent) pair of dictionaries: distance maps each
+    reachable person_id to their degrees of separation from the source,
+    parent maps each to the (movie_id, person_id) step back towards it.
+    """
+    distance = {source: 0}
+    parent = {source: None}
+    frontier = deque([source])
+    while frontier:
+        person_id = frontier.popleft()
+        for movie_id, neighbor in neighbors_for_person(person_id):
+            if neighbor not in distance:
+                distance[neighbor] = distance[person_id] + 1
+                parent[neighbor] = (movie_id, person_id)
+                frontier.append(neighbor)
+    return distance, parent
+
+
+def path_from_parents(parent, target):
+    """
+    Returns the list of (movie_id, person_id) pairs from the source of a
+    `distances_from` search to `target`, or None if it is unreachable.
+    """
+    if target not in parent:
+        return None
+    path = []
+    while parent[target] is not None:
+        movie_id, person_id = parent[target]
+        path.append((movie_id, target))
+        target = person_id
+    path.reverse()
+    return path
+
+
+def reverse_path(source, path):
+    """
+    Returns the (movie_id, person_id) path that walks `path`,
+    which starts at `source`, backwards from its end to `source`.
+    """
+    person_ids = [source] + [person_id for _, person_id in path]
+    return [(path[i][0], person_ids[i]) for i in range(len(path) - 1, -1, -1)]
+
+
+class LandmarkIndex():
+    """
+    Breadth-first search trees from a few hub actors ("landmarks"),
+    giving bounds on the distance between any two people.
+
+    Going through a landmark bounds a distance from above, and the triangle
+    inequality bounds it from below, which prunes later searches.
+    """
+
+    def __init__(self, k=16, landmarks=None):
+        if landmarks is None:
+            # People who starred in the most movies make good hubs
+            landmarks = sorted(
+                people, key=lambda person_id: len(people[person_id]["movies"]),
+                reverse=True
+            )[:k]
+        self.landmarks = list(landmarks)
+        self.trees = [distances_from(landmark) for landmark in self.landmarks]
+
+    def upper_bound(self, source, target):
+        """
+        Returns (distance, landmark) for the shortest connection between
+        source and target through a landmark, or (None, None) if none is.
+        """
+        best, via = None, None
+        for landmark, (distance, _) in zip(self.landmarks, self.trees):
+            if source in distance and target in distance:
+                length = distance[source] + distance[target]
+                if best is None or length < best:
+                    best, via = length, landmark
+        return best, via
+
+    def lower_bound(self, source, target):
+        """
+        Returns a lower bound on the distance between source and target,
+        which is infinite if a landmark reaches only one of them.
+        """
+        bound = 0
+        for distance, _ in self.trees:
+            if (source in distance) != (target in distance):
+                return math.inf
+            if source in distance:
+                bound = max(bound, abs(distance[source] - distance[target]))
+        return bound
+
+    def path_via(self, source, target, landmark):
+        """
+        Returns the (movie_id, person_id) path from source to target
+        that goes through `landmark`.
+        """
+        _, parent = self.trees[self.landmarks.index(landmark)]
+        to_source = path_from_parents(parent, source)
+        return reverse_path(landmark, to_source) + path_from_parents(parent, target)
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, skipping anyone who
+        cannot lie on a path shorter than the best landmark path.
+
+        If no possible path, returns None.
+        """
+        if source == target:
+            return []
+        if self.lower_bound(source, target) == math.inf:
+            return None
+        upper, landmark = self.upper_bound(source, target)
+        if upper is not None and upper == self.lower_bound(source, target):
+            return self.path_via(source, target, landmark)
+
+        parent = {source: None}
+        frontier = [source]
+        depth = 0
+        while frontier and (upper is None or depth + 1 < upper):
+            depth += 1
+            next_frontier = []
+            for person_id in frontier:
+                for movie_id, neighbor in neighbors_for_person(person_id):
+                    if neighbor in parent:
+                        continue
+                    parent[neighbor] = (movie_id, person_id)
+                    if neighbor == target:
+                        return path_from_parents(parent, target)
+                    # Only keep people who could still beat the landmarks
+                    if (upper is None or
+                            depth + self.lower_bound(neighbor, target) < upper):
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        if upper is None:
+            return None
+        return self.path_via(source, target, landmark)
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If not `interactive`, ambiguous names return None
+    instead of prompting for an id.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
+        if not interactive:
+            return None
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -164,11 +557,15 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    neighbors = neighbor_cache.get(person_id)
+    if neighbors is not None:
+        return neighbors
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+        for star_id in movies[movie_id]["stars"]:
+            neighbors.add((movie_id, star_id))
+    neighbor_cache.put(person_id, neighbors)
     return neighbors
 
 if __name__ == "__main__":
@@ -0,0 +1,351 @@
+import csv
+import mmap
+import os
+import struct
+from array import array
+from collections import deque
+
+# File written next to the CSVs holding a parsed graph
+SNAPSHOT = "degrees.snapshot"
+SNAPSHOT_MAGIC = b"DEGS"
+# Bump whenever the snapshot layout changes
+SNAPSHOT_VERSION = 1
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Magic, version, (mtime, size) of each source, then section counts
+HEADER = struct.Struct(f"<4sI{2 * len(SOURCES)}q3q")
+
+
+class Graph():
+    """
+    Actor-movie graph with IMDb ids interned to dense integers.
+
+    People and movies are numbered 0..n-1 in file order. Adjacency is
+    stored CSR-style: the movies of person `p` are
+    `person_movies[person_indptr[p]:person_indptr[p + 1]]`, and the stars
+    of movie `m` are `movie_people[movie_indptr[m]:movie_indptr[m + 1]]`.
+    """
+
+    def __init__(self, person_ids, person_names, births,
+                 movie_ids, titles, years,
+                 person_indptr, person_movies, movie_indptr, movie_people):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.births = births
+        self.movie_ids = movie_ids
+        self.titles = titles
+        self.years = years
+        self.person_indptr = person_indptr
+        self.person_movies = person_movies
+        self.movie_indptr = movie_indptr
+        self.movie_people = movie_people
+
+        # Maps IMDb person ids to indices, and names to lists of indices
+        self.person_index = {
+            person_id: i for i, person_id in enumerate(person_ids)
+        }
+        self.names = {}
+        for i, name in enumerate(person_names):
+            self.names.setdefault(name.lower(), []).append(i)
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load a graph straight from the CSV files in `directory`,
+        without building the nested dictionaries of `load_data`.
+        """
+        person_ids, person_names, births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                births.append(row["birth"])
+
+        movie_ids, titles, years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_ids.append(row["id"])
+                titles.append(row["title"])
+                years.append(row["year"])
+
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edges = set()
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person = person_index.get(row["person_id"])
+                movie = movie_index.get(row["movie_id"])
+                if person is not None and movie is not None:
+                    edges.add((person, movie))
+
+        return cls.from_edges(person_ids, person_names, births,
+                              movie_ids, titles, years, edges)
+
+    @classmethod
+    def from_dicts(cls, people, movies):
+        """
+        Build a graph from the `people` and `movies` dictionaries
+        populated by `load_data`.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edges = [
+            (person_index[person_id], movie_index[movie_id])
+            for person_id in person_ids
+            for movie_id in people[person_id]["movies"]
+            if movie_id in movie_index
+        ]
+        return cls.from_edges(
+            person_ids,
+            [people[person_id]["name"] for person_id in person_ids],
+            [people[person_id]["birth"] for person_id in person_ids],
+            movie_ids,
+            [movies[movie_id]["title"] for movie_id in movie_ids],
+            [movies[movie_id]["year"] for movie_id in movie_ids],
+            edges
+        )
+
+    @classmethod
+    def from_edges(cls, person_ids, person_names, births,
+                   movie_ids, titles, years, edges):
+        """
+        Build a graph from distinct (person, movie) index pairs.
+        """
+        edges = list(edges)
+        person_indptr, person_movies = csr(len(person_ids), edges)
+        movie_indptr, movie_people = csr(
+            len(movie_ids), [(m, p) for p, m in edges]
+        )
+        return cls(person_ids, person_names, births,
+                   movie_ids, titles, years,
+                   person_indptr, person_movies, movie_indptr, movie_people)
+
+    @classmethod
+    def from_directory(cls, directory):
+        """
+        Load the graph for `directory` from its snapshot if that is still
+        current, otherwise parse the CSVs and write a fresh snapshot.
+        """
+        filename = os.path.join(directory, SNAPSHOT)
+        sources = fingerprint(directory)
+        graph = cls.load(filename, sources)
+        if graph is None:
+            graph = cls.from_csv(directory)
+            graph.save(filename, sources)
+        return graph
+
+    @classmethod
+    def load(cls, filename, sources):
+        """
+        Memory-map a snapshot written by `save`. Returns None if there is no
+        snapshot, or it has another version or other source fingerprints.
+        """
+        try:
+            with open(filename, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(data) < HEADER.size:
+            return None
+        header = HEADER.unpack_from(data)
+        magic, version = header[:2]
+        stored = header[2:-3]
+        num_people, num_movies, num_edges = header[-3:]
+        if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION
+                or stored != sources):
+            return None
+
+        view = memoryview(data)
+        offset = HEADER.size
+
+        def section(format, count):
+            nonlocal offset
+            size = struct.calcsize(format) * count
+            values = view[offset:offset + size].cast(format)
+            offset = align(offset + size)
+            return values
+
+        def strings(count):
+            (size,) = struct.unpack_from("<q", data, offset)
+            values = section("B", 8 + size)[8:]
+            values = bytes(values).decode("utf-8").split("\0")
+            return values if count else []
+
+        person_indptr = section("q", num_people + 1)
+        person_movies = section("i", num_edges)
+        movie_indptr = section("q", num_movies + 1)
+        movie_people = section("i", num_edges)
+        tables = [strings(num_people) for _ in range(3)]
+        tables += [strings(num_movies) for _ in range(3)]
+        return cls(*tables[:3], *tables[3:],
+                   person_indptr, person_movies, movie_indptr, movie_people)
+
+    def save(self, filename, sources):
+        """
+        Write the graph to `filename` as a binary snapshot tagged with the
+        fingerprint of the CSVs it came from. Failing to write is not fatal,
+        the snapshot is only a cache.
+        """
+        sections = [
+            array("q", self.person_indptr).tobytes(),
+            array("i", self.person_movies).tobytes(),
+            array("q", self.movie_indptr).tobytes(),
+            array("i", self.movie_people).tobytes(),
+        ]
+        for table in (self.person_ids, self.person_names, self.births,
+                      self.movie_ids, self.titles, self.years):
+            blob = "\0".join(table).encode("utf-8")
+            sections.append(struct.pack("<q", len(blob)) + blob)
+
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(HEADER.pack(
+                    SNAPSHOT_MAGIC, SNAPSHOT_VERSION, *sources,
+                    len(self.person_ids), len(self.movie_ids),
+                    len(self.person_movies)
+                ))
+                offset = HEADER.size
+                for section in sections:
+                    f.write(section)
+                    padding = align(offset + len(section)) - offset - len(section)
+                    f.write(bytes(padding))
+                    offset += len(section) + padding
+            # Readers only ever see a complete snapshot
+            os.replace(temporary, filename)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+    def person_id_for_name(self, name):
+        """
+        Returns the IMDB id for a person's name,
+        resolving ambiguities as needed.
+        """
+        people = self.names.get(name.lower(), [])
+        if len(people) == 0:
+            return None
+        elif len(people) > 1:
+            print(f"Which '{name}'?")
+            for person in people:
+                person_id = self.person_ids[person]
+                name = self.person_names[person]
+                birth = self.births[person]
+                print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+            person_id = input("Intended Person ID: ")
+            if person_id in self.person_index:
+                if self.person_index[person_id] in people:
+                    return person_id
+            return None
+        else:
+            return self.person_ids[people[0]]
+
+    def neighbors(self, person):
+        """
+        Returns (movie, person) index pairs for people
+        who starred with a given person.
+        """
+        neighbors = []
+        for i in range(self.person_indptr[person], self.person_indptr[person + 1]):
+            movie = self.person_movies[i]
+            for j in range(self.movie_indptr[movie], self.movie_indptr[movie + 1]):
+                neighbors.append((movie, self.movie_people[j]))
+        return neighbors
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie, person) index pairs
+        that connect the source index to the target index.
+
+        If no possible path, returns None.
+        """
+        if source == target:
+            return []
+
+        person_indptr, person_movies = self.person_indptr, self.person_movies
+        movie_indptr, movie_people = self.movie_indptr, self.movie_people
+
+        # Parent person and connecting movie of every reached person
+        parent = array("i", [-1]) * len(self.person_ids)
+        via = array("i", [-1]) * len(self.person_ids)
+        parent[source] = source
+        # Every cast only needs to be scanned once
+        seen_movies = bytearray(len(self.movie_ids))
+
+        frontier = deque([source])
+        while frontier:
+            person = frontier.popleft()
+            for i in range(person_indptr[person], person_indptr[person + 1]):
+                movie = person_movies[i]
+                if seen_movies[movie]:
+                    continue
+                seen_movies[movie] = 1
+                for j in range(movie_indptr[movie], movie_indptr[movie + 1]):
+                    star = movie_people[j]
+                    if parent[star] != -1:
+                        continue
+                    parent[star] = person
+                    via[star] = movie
+                    if star == target:
+                        path = []
+                        while star != source:
+                            path.append((via[star], star))
+                            star = parent[star]
+                        path.reverse()
+                        return path
+                    frontier.append(star)
+        return None
+
+    def shortest_path_ids(self, source_id, target_id):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs that
+        connect two IMDb person ids, searching on integer indices.
+        """
+        path = self.shortest_path(
+            self.person_index[source_id], self.person_index[target_id]
+        )
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+
+def csr(n, pairs):
+    """
+    Returns (indptr, indices) arrays grouping a list of (row, column)
+    pairs by row for rows 0..n-1, using a counting sort.
+    """
+    indptr = array("l", [0]) * (n + 1)
+    for row, _ in pairs:
+        indptr[row + 1] += 1
+    for i in range(n):
+        indptr[i + 1] += indptr[i]
+    indices = array("i", [0]) * len(pairs)
+    fill = array("l", indptr)
+    for row, column in pairs:
+        indices[fill[row]] = column
+        fill[row] += 1
+    return indptr, indices
+
+
+def align(offset):
+    """
+    Rounds `offset` up to the next multiple of 8 bytes.
+    """
+    return (offset + 7) // 8 * 8
+
+
+def fingerprint(directory):
+    """
+    Returns the (mtime, size) of every source CSV in `directory`,
+    flattened into one tuple.
+    """
+    sources = []
+    for source in SOURCES:
+        stat = os.stat(os.path.join(directory, source))
+        sources += [stat.st_mtime_ns, stat.st_size]
+    return tuple(sources)
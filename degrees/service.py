@@ -0,0 +1,130 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+"""
+Answers many degrees of separation queries against one loaded dataset,
+either as a batch of name pairs or as a local HTTP service.
+"""
+
+
+def answer(source_name, target_name, search=degrees.shortest_path):
+    """
+    Resolves both names and searches for a path between them.
+
+    Returns a JSON-serializable dictionary with the path as
+    [movie_id, person_id] pairs, or an error, and the query latency.
+    """
+    start = time.perf_counter()
+    result = {"source": source_name, "target": target_name}
+    source = degrees.person_id_for_name(source_name, interactive=False)
+    target = degrees.person_id_for_name(target_name, interactive=False)
+    if source is None or target is None:
+        missing = source_name if source is None else target_name
+        result["error"] = f"No unique person named '{missing}'."
+    else:
+        path = search(source, target)
+        result["degrees"] = None if path is None else len(path)
+        result["path"] = None if path is None else [list(step) for step in path]
+    result["latency_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def run_batch(lines, out, search=degrees.shortest_path):
+    """
+    Reads tab-separated source and target names from `lines`
+    and writes one JSON result per pair to `out`.
+    """
+    for row in csv.reader(lines, delimiter="\t"):
+        if not row:
+            continue
+        if len(row) != 2:
+            result = {"error": f"Expected source and target, got {row}."}
+        else:
+            result = answer(row[0], row[1], search)
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+def serve(port, search=degrees.shortest_path):
+    """
+    Serves GET /?source=NAME&target=NAME on localhost until interrupted,
+    keeping the loaded graph in memory between queries.
+    GET /stats reports the degrees cache hit and miss counts.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/stats":
+                status = 200
+                result = degrees.cache_info()
+            elif "source" not in query or "target" not in query:
+                status = 400
+                result = {"error": "Expected source and target parameters."}
+            else:
+                status = 200
+                result = answer(query["source"][0], query["target"][0], search)
+            body = json.dumps(result).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = HTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving on http://127.0.0.1:{port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch degrees of separation.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both source and target at once")
+    parser.add_argument("--neighbor-cache", metavar="N", type=int,
+                        default=degrees.NEIGHBOR_CACHE_SIZE,
+                        help="people whose neighbors are kept cached")
+    parser.add_argument("--path-cache", metavar="N", type=int,
+                        default=degrees.PATH_CACHE_SIZE,
+                        help="search results kept cached")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--batch", metavar="FILE",
+                      help="tab-separated name pairs, or - for stdin")
+    mode.add_argument("--serve", metavar="PORT", type=int,
+                      help="answer queries over HTTP on localhost")
+    args = parser.parse_args()
+
+    degrees.configure_caches(args.neighbor_cache, args.path_cache)
+    if args.bidirectional:
+        search = degrees.bidirectional_shortest_path
+    else:
+        search = degrees.shortest_path
+
+    # Results go to stdout, so progress goes to stderr
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory)
+    print("Data loaded.", file=sys.stderr)
+
+    if args.serve is not None:
+        serve(args.serve, search)
+    elif args.batch == "-":
+        run_batch(sys.stdin, sys.stdout, search)
+    else:
+        with open(args.batch, encoding="utf-8") as f:
+            run_batch(f, sys.stdout, search)
+
+
+if __name__ == "__main__":
+    main()
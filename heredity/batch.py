@@ -0,0 +1,73 @@
+import argparse
+import functools
+import glob
+import json
+import multiprocessing
+import os
+import sys
+
+import heredity
+
+"""
+Runs heredity inference over many family CSV files on a pool of worker
+processes and writes the marginals of each family as one JSON line.
+"""
+
+
+def family_files(patterns):
+    """
+    Return the sorted CSV files matched by each pattern, where a
+    directory stands for every CSV file in it.
+    """
+    filenames = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.csv")
+        filenames.update(glob.glob(pattern))
+    return sorted(filenames)
+
+
+def infer_family(filename, method="elimination"):
+    """
+    Return a JSON-serializable result with the gene and trait marginals
+    of everyone in a family file, or the error that stopped inference.
+    """
+    try:
+        people = heredity.load_data(filename)
+        probabilities = heredity.METHODS[method](people)
+    except Exception as error:
+        return {"file": filename, "error": f"{type(error).__name__}: {error}"}
+    return {"file": filename, "marginals": probabilities}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Infer many families at once.")
+    parser.add_argument("families", nargs="+",
+                        help="family CSV files, directories or glob patterns")
+    parser.add_argument("--method", choices=sorted(heredity.METHODS),
+                        default="elimination",
+                        help="inference algorithm (default: elimination)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--output", help="write JSON lines here, not stdout")
+    args = parser.parse_args()
+
+    filenames = family_files(args.families)
+    if not filenames:
+        sys.exit("No family files found.")
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        # Workers live across many files, so each builds its probability
+        # tables from PROBS once
+        with multiprocessing.Pool(args.workers) as pool:
+            infer = functools.partial(infer_family, method=args.method)
+            for result in pool.imap(infer, filenames, chunksize=8):
+                out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
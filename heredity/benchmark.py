@@ -0,0 +1,66 @@
+import argparse
+import time
+
+import heredity
+
+"""
+Times the heredity inference methods on a family and checks that they
+agree with brute-force enumeration.
+"""
+
+
+def largest_difference(a, b):
+    """
+    Return the largest absolute difference between two probability tables.
+    """
+    return max(
+        abs(a[person][field][value] - b[person][field][value])
+        for person in a
+        for field in a[person]
+        for value in a[person][field]
+    )
+
+
+def compare_methods(people, methods, repeat=1):
+    """
+    Run each method `repeat` times on `people`, and return its best time,
+    speedup over enumeration and largest difference from enumeration.
+    """
+    results = {}
+    for method in ["enumeration"] + [m for m in methods if m != "enumeration"]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            probabilities = heredity.METHODS[method](people)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        results[method] = {"seconds": best, "probabilities": probabilities}
+
+    reference = results["enumeration"]
+    for result in results.values():
+        result["speedup"] = reference["seconds"] / result["seconds"]
+        result["difference"] = largest_difference(
+            reference["probabilities"], result["probabilities"]
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heredity inference.")
+    parser.add_argument("data", help="family CSV file")
+    parser.add_argument("--methods", nargs="+", choices=sorted(heredity.METHODS),
+                        default=sorted(heredity.METHODS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    people = heredity.load_data(args.data)
+    results = compare_methods(people, args.methods, args.repeat)
+    print(f"{len(people)} people")
+    for method, result in results.items():
+        print(f"  {method}: {result['seconds']:.4f}s, "
+              f"{result['speedup']:.1f}x, "
+              f"max difference {result['difference']:.1e}")
+
+
+if __name__ == "__main__":
+    main()
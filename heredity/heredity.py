@@ -1,6 +1,15 @@
+import argparse
 import csv
+import functools
+import heapq
 import itertools
+import math
+import multiprocessing
+import random
 import sys
+import time
+
+import numpy as np
 
 """
 Shuyan Liu
@@ -42,15 +51,84 @@ PROBS = {
 }
 
 
+# Values each kind of variable can take
+DOMAINS = {
+    "gene": (0, 1, 2),
+    "trait": (True, False)
+}
+
+# Assignments scored together by the vectorized method
+CHUNK_SIZE = 1 << 16
+
+# Default budget of the sampling methods, how often they report their
+# estimates, and how many Gibbs sweeps are discarded before counting
+SAMPLES = 10000
+REPORT_EVERY = 1000
+BURN_IN = 200
+
+
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Infer genes and traits.")
+    parser.add_argument("data", help="family CSV file")
+    parser.add_argument("--method", choices=sorted(METHODS),
+                        default="enumeration",
+                        help="inference algorithm (default: enumeration)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to enumerate with (enumeration only)")
+    parser.add_argument("--samples", type=int,
+                        help="sample budget (sampling methods only)")
+    parser.add_argument("--seconds", type=float,
+                        help="time budget (sampling methods only)")
+    parser.add_argument("--seed", type=int, help="random seed for sampling")
+    args = parser.parse_args()
+    if args.workers != 1 and args.method != "enumeration":
+        parser.error("--workers only applies to --method enumeration")
+    sampling = args.method in SAMPLERS
+    if not sampling and (args.samples is not None or args.seconds is not None):
+        parser.error("--samples and --seconds only apply to sampling methods")
+    if args.samples is not None and args.samples <= 0:
+        parser.error("--samples must be positive")
+    if args.seconds is not None and args.seconds <= 0:
+        parser.error("--seconds must be positive")
+    people = load_data(args.data)
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    errors = None
+    if args.method == "enumeration":
+        probabilities = infer_by_enumeration(people, args.workers)
+    elif sampling:
+        # Ctrl-C stops sampling early and keeps the latest estimates
+        try:
+            for probabilities, errors, n in SAMPLERS[args.method](
+                    people, args.samples, args.seconds, seed=args.seed):
+                print(f"{n} samples", file=sys.stderr)
+        except KeyboardInterrupt:
+            if errors is None:
+                sys.exit("Interrupted before any estimates.")
+    else:
+        probabilities = METHODS[args.method](people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    e = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {e:.4f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a gene and trait probability table for everyone in `people`,
+    with every probability 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -65,8 +143,21 @@ def main():
         for person in people
     }
 
+
+def infer_by_enumeration(people, workers=1):
+    """
+    Return normalized gene and trait probabilities for everyone in
+    `people` by summing the joint probability of every assignment.
+
+    With several `workers`, the (trait set, one-gene set) pairs are dealt
+    out between processes, each summing its own share. There are only as
+    many trait sets as unknown traits allow, often one or two, but always
+    2^N one-gene sets, so every worker gets work.
+    """
+
     # Loop over all sets of people who might have the trait
     names = set(people)
+    trait_sets = []
     for have_trait in powerset(names):
 
         # Check if current set of people violates known information
@@ -75,28 +166,673 @@ def main():
              people[person]["trait"] != (person in have_trait))
             for person in names
         )
-        if fails_evidence:
-            continue
+        if not fails_evidence:
+            trait_sets.append(have_trait)
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+    if workers == 1:
+        probabilities = enumerate_assignments(people, trait_sets)
+    else:
+        shares = [(people, trait_sets, i, workers) for i in range(workers)]
+        with multiprocessing.Pool(workers) as pool:
+            partials = pool.starmap(enumerate_assignments, shares)
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+        # Merge each worker's sums into one table
+        probabilities = empty_probabilities(people)
+        for partial in partials:
+            for person in partial:
+                for field in partial[person]:
+                    for value, p in partial[person][field].items():
+                        probabilities[person][field][value] += p
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
+
+
+def enumerate_assignments(people, trait_sets, share=0, shares=1):
+    """
+    Return unnormalized gene and trait probabilities summed over every
+    gene assignment combined with each set in `trait_sets`.
+
+    Only every `shares`th (trait set, one-gene set) pair is summed,
+    starting from pair number `share`.
+    """
+
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
+
+    # Sorted so that every worker numbers the pairs the same way
+    names = sorted(people)
+    pairs = itertools.product(trait_sets, powerset(names))
+    for have_trait, one_gene in itertools.islice(pairs, share, None, shares):
+
+        # Loop over all sets of people who might have two copies
+        for two_genes in powerset(set(names) - one_gene):
+
+            # Update probabilities with new joint probability
+            p = joint_probability(people, one_gene, two_genes, have_trait)
+            update(probabilities, one_gene, two_genes, have_trait, p)
+    return probabilities
+
+
+def infer_lazily(people):
+    """
+    Return normalized gene and trait probabilities for everyone in
+    `people` by summing over the assignments generated by `assignments`.
+    """
+    probabilities = empty_probabilities(people)
+    for one_gene, two_genes, have_trait, p in assignments(people):
+        update(probabilities, one_gene, two_genes, have_trait, p)
+    normalize(probabilities)
+    return probabilities
+
+
+def assignments(people):
+    """
+    Generate (one_gene, two_genes, have_trait, p) for every gene and trait
+    assignment consistent with the known traits that has a non-zero joint
+    probability p.
+
+    People are assigned parents first, so each person's probability
+    multiplies onto the partial product of everyone before them, and
+    branches that reach probability 0 are dropped at once. Known traits
+    are fixed, so only unknown variables are enumerated.
+    """
+    order = topological_order(people)
+    genes = {}
+    traits = {}
+
+    def extend(i, probability):
+        if i == len(order):
+            one_gene = {person for person in order if genes[person] == 1}
+            two_genes = {person for person in order if genes[person] == 2}
+            have_trait = {person for person in order if traits[person]}
+            yield one_gene, two_genes, have_trait, probability
+            return
+
+        person = order[i]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        known = people[person]["trait"]
+        for count in DOMAINS["gene"]:
+            if mother is None and father is None:
+                gene_probability = PROBS["gene"][count]
+            else:
+                gene_probability = inheritance_probability(
+                    count, genes[mother], genes[father]
+                )
+            for trait in (DOMAINS["trait"] if known is None else (known,)):
+                p = probability * gene_probability * PROBS["trait"][count][trait]
+                if p == 0:
+                    continue
+                genes[person] = count
+                traits[person] = trait
+                yield from extend(i + 1, p)
+
+    yield from extend(0, 1.0)
+
+
+def topological_order(people):
+    """
+    Return the names in `people` ordered so that parents come before
+    their children.
+    """
+    order = []
+    visited = set()
+
+    def visit(person):
+        if person in visited:
+            return
+        visited.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                visit(parent)
+        order.append(person)
 
-    # Print results
     for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+        visit(person)
+    return order
+
+
+def infer_vectorized(people, chunk_size=CHUNK_SIZE):
+    """
+    Return normalized gene and trait probabilities for everyone in
+    `people` by scoring assignments in bulk with NumPy.
+
+    Every assignment consistent with the known traits is a row of gene
+    counts and traits, decoded from its row number, and `chunk_size` rows
+    at a time get their joint probabilities from lookup tables built from
+    `PROBS`. Marginals are one matrix product of those probabilities with
+    a one-hot encoding of the rows.
+    """
+    names = list(people)
+    index = {person: i for i, person in enumerate(names)}
+    unknown = [i for i, person in enumerate(names)
+               if people[person]["trait"] is None]
+    known = np.array([bool(people[person]["trait"]) for person in names])
+
+    prior, inherit, trait_given_genes = probability_tables()
+    parents = [(index[people[person]["mother"]], index[people[person]["father"]])
+               if people[person]["mother"] is not None else None
+               for person in names]
+
+    n = len(names)
+    rows = 3 ** n * 2 ** len(unknown)
+    gene_radix = 3 ** np.arange(n)
+    trait_radix = 2 ** np.arange(len(unknown))
+    totals = np.zeros(5 * n)
+    for start in range(0, rows, chunk_size):
+        row = np.arange(start, min(start + chunk_size, rows), dtype=np.int64)
+        genes = (row[:, None] // gene_radix) % 3
+        traits = np.broadcast_to(known, (len(row), n)).copy()
+        traits[:, unknown] = ((row // 3 ** n)[:, None] // trait_radix) % 2 == 1
+
+        p = np.ones(len(row))
+        for i in range(n):
+            if parents[i] is None:
+                p *= prior[genes[:, i]]
+            else:
+                m, f = parents[i]
+                p *= inherit[genes[:, i], genes[:, m], genes[:, f]]
+            p *= trait_given_genes[genes[:, i], traits[:, i].astype(np.int64)]
+
+        # Columns are 0, 1, 2 copies then no trait, trait, per person
+        onehot = np.concatenate([
+            genes[:, :, None] == np.arange(3),
+            traits[:, :, None] == np.array([False, True])
+        ], axis=2).reshape(len(row), 5 * n)
+        totals += p @ onehot
+
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(names):
+        for genes in DOMAINS["gene"]:
+            probabilities[person]["gene"][genes] = totals[5 * i + genes]
+        probabilities[person]["trait"][False] = totals[5 * i + 3]
+        probabilities[person]["trait"][True] = totals[5 * i + 4]
+    normalize(probabilities)
+    return probabilities
+
+
+@functools.lru_cache(maxsize=None)
+def probability_tables():
+    """
+    Return `PROBS` as NumPy lookup tables: the gene prior indexed by gene
+    count, inheritance indexed by child, mother and father gene counts,
+    and trait probability indexed by gene count and trait (0 or 1).
+
+    The tables are built once and shared, so they must not be modified.
+    """
+    prior = np.array([PROBS["gene"][genes] for genes in range(3)])
+    inherit = np.array([
+        [[inheritance_probability(genes, m, f) for f in range(3)]
+         for m in range(3)]
+        for genes in range(3)
+    ])
+    trait_given_genes = np.array([
+        [PROBS["trait"][genes][False], PROBS["trait"][genes][True]]
+        for genes in range(3)
+    ])
+    return prior, inherit, trait_given_genes
+
+
+def likelihood_weighting(people, samples=None, seconds=None,
+                         report_every=REPORT_EVERY, seed=None):
+    """
+    Estimate gene and trait probabilities for everyone in `people` by
+    likelihood weighting: sample genes and unknown traits parents first,
+    and weight each sample by the probability of the known traits.
+    With many known traits the weights degenerate, and `gibbs_sampling`
+    suits the family better.
+
+    Sampling stops after `samples` samples or `seconds` seconds, whichever
+    comes first (`SAMPLES` samples if neither is given). Every
+    `report_every` samples, and at the end, yield (probabilities, errors, n):
+    the estimates so far, their standard errors and the samples drawn.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+
+    # Sums of weights, and of weights (and squared weights) where each
+    # person has each gene count or the trait
+    total = 0.0
+    total_squares = 0.0
+    sums = {person: [0.0] * 4 for person in people}
+    square_sums = {person: [0.0] * 4 for person in people}
+
+    def estimates():
+        probabilities = empty_probabilities(people)
+        errors = empty_probabilities(people)
+        for person in people:
+            for i in range(4):
+                mean = sums[person][i] / total if total else 0.0
+                # Delta-method variance of a self-normalized estimate
+                spread = (square_sums[person][i] * (1 - 2 * mean)
+                          + mean ** 2 * total_squares)
+                error = math.sqrt(max(spread, 0)) / total if total else math.inf
+                if i < 3:
+                    probabilities[person]["gene"][i] = mean
+                    errors[person]["gene"][i] = error
+                else:
+                    probabilities[person]["trait"][True] = mean
+                    probabilities[person]["trait"][False] = 1 - mean
+                    errors[person]["trait"][True] = error
+                    errors[person]["trait"][False] = error
+        return probabilities, errors
+
+    n = 0
+    for _ in sampling_budget(samples, seconds):
+        genes = {}
+        weight = 1.0
+        traits = {}
+        for person in order:
+            genes[person] = rng.choices(
+                DOMAINS["gene"], gene_distribution(people, person, genes)
+            )[0]
+            known = people[person]["trait"]
+            if known is None:
+                traits[person] = rng.random() < PROBS["trait"][genes[person]][True]
+            else:
+                traits[person] = known
+                weight *= PROBS["trait"][genes[person]][known]
+
+        total += weight
+        total_squares += weight ** 2
+        for person in order:
+            for i in (genes[person], 3) if traits[person] else (genes[person],):
+                sums[person][i] += weight
+                square_sums[person][i] += weight ** 2
+
+        n += 1
+        if n % report_every == 0:
+            yield (*estimates(), n)
+    if n % report_every:
+        yield (*estimates(), n)
+
+
+def gibbs_sampling(people, samples=None, seconds=None, burn_in=BURN_IN,
+                   report_every=REPORT_EVERY, seed=None):
+    """
+    Estimate gene and trait probabilities for everyone in `people` by
+    Gibbs sampling: repeatedly resample each person's genes given their
+    parents, children and trait, then their trait if it is unknown.
+
+    After `burn_in` discarded sweeps, sampling stops after `samples`
+    sweeps or `seconds` seconds, whichever comes first (`SAMPLES` sweeps
+    if neither is given). Every `report_every` sweeps, and at the end,
+    yield (probabilities, errors, n): the estimates so far, their standard
+    errors from the means of each block of `report_every` sweeps, and the
+    sweeps counted.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+    children = {person: [] for person in people}
+    for person in people:
+        if people[person]["mother"] is not None:
+            children[people[person]["mother"]].append(person)
+            children[people[person]["father"]].append(person)
+
+    # Start from a sample of the prior, with the known traits
+    genes = {}
+    traits = {}
+    for person in order:
+        genes[person] = rng.choices(
+            DOMAINS["gene"], gene_distribution(people, person, genes)
+        )[0]
+        known = people[person]["trait"]
+        if known is None:
+            traits[person] = rng.random() < PROBS["trait"][genes[person]][True]
+        else:
+            traits[person] = known
+
+    def sweep():
+        for person in order:
+            weights = []
+            for count in DOMAINS["gene"]:
+                genes[person] = count
+                weight = (gene_distribution(people, person, genes)[count]
+                          * PROBS["trait"][count][traits[person]])
+                for child in children[person]:
+                    weight *= gene_distribution(people, child, genes)[genes[child]]
+                weights.append(weight)
+            genes[person] = rng.choices(DOMAINS["gene"], weights)[0]
+            if people[person]["trait"] is None:
+                traits[person] = rng.random() < PROBS["trait"][genes[person]][True]
+
+    for _ in range(burn_in):
+        sweep()
+
+    # Counts in the current block, and running statistics of block means
+    counts = {person: [0] * 4 for person in people}
+    means = {person: [0.0] * 4 for person in people}
+    squares = {person: [0.0] * 4 for person in people}
+    totals = {person: [0] * 4 for person in people}
+    blocks = 0
+
+    def estimates(n):
+        probabilities = empty_probabilities(people)
+        errors = empty_probabilities(people)
+        for person in people:
+            for i in range(4):
+                mean = totals[person][i] / n
+                if blocks > 1:
+                    error = math.sqrt(squares[person][i] / (blocks - 1) / blocks)
+                else:
+                    error = math.inf
+                if i < 3:
+                    probabilities[person]["gene"][i] = mean
+                    errors[person]["gene"][i] = error
+                else:
+                    probabilities[person]["trait"][True] = mean
+                    probabilities[person]["trait"][False] = 1 - mean
+                    errors[person]["trait"][True] = error
+                    errors[person]["trait"][False] = error
+        return probabilities, errors
+
+    n = 0
+    for _ in sampling_budget(samples, seconds):
+        sweep()
+        for person in order:
+            counts[person][genes[person]] += 1
+            if traits[person]:
+                counts[person][3] += 1
+
+        n += 1
+        if n % report_every == 0:
+            blocks += 1
+            for person in people:
+                for i in range(4):
+                    mean = counts[person][i] / report_every
+                    totals[person][i] += counts[person][i]
+                    delta = mean - means[person][i]
+                    means[person][i] += delta / blocks
+                    squares[person][i] += delta * (mean - means[person][i])
+                    counts[person][i] = 0
+            yield (*estimates(n), n)
+
+    if n % report_every:
+        for person in people:
+            for i in range(4):
+                totals[person][i] += counts[person][i]
+        yield (*estimates(n), n)
+
+
+def sampling_budget(samples=None, seconds=None):
+    """
+    Generate one item per sample until `samples` have been drawn or
+    `seconds` have passed, or `SAMPLES` items if neither is given. The
+    first sample is always drawn, however short the time.
+    """
+    if samples is None and seconds is None:
+        samples = SAMPLES
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    n = 0
+    while samples is None or n < samples:
+        if n and deadline is not None and time.perf_counter() >= deadline:
+            return
+        yield n
+        n += 1
+
+
+def gene_distribution(people, person, genes):
+    """
+    Return the probabilities of `person` having 0, 1 and 2 copies of the
+    gene, given the gene counts of their parents in `genes`.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    if mother is None and father is None:
+        return [PROBS["gene"][count] for count in DOMAINS["gene"]]
+    return [
+        inheritance_probability(count, genes[mother], genes[father])
+        for count in DOMAINS["gene"]
+    ]
+
+
+def infer_by_likelihood_weighting(people):
+    """
+    Return gene and trait probabilities for everyone in `people`
+    estimated from `SAMPLES` likelihood-weighted samples.
+    """
+    for probabilities, _, _ in likelihood_weighting(people):
+        pass
+    return probabilities
+
+
+def infer_by_gibbs_sampling(people):
+    """
+    Return gene and trait probabilities for everyone in `people`
+    estimated from `SAMPLES` Gibbs sampling sweeps.
+    """
+    for probabilities, _, _ in gibbs_sampling(people):
+        pass
+    return probabilities
+
+
+def infer_by_elimination(people):
+    """
+    Return normalized gene and trait probabilities for everyone in
+    `people` by variable elimination over the family's factor graph.
+
+    One elimination order serves every query: messages are passed up
+    the tree of buckets it forms and back down (see `marginals`), which
+    takes linear time for tree-shaped families.
+    """
+    factors = family_factors(people)
+    beliefs = marginals(factors)
+    probabilities = empty_probabilities(people)
+    for person in people:
+        for (genes,), p in beliefs[("gene", person)].table.items():
+            probabilities[person]["gene"][genes] = p
+        if people[person]["trait"] is None:
+            for (trait,), p in beliefs[("trait", person)].table.items():
+                probabilities[person]["trait"][trait] = p
+        else:
+            probabilities[person]["trait"][people[person]["trait"]] = 1
+    normalize(probabilities)
+    return probabilities
+
+
+class Factor():
+    """
+    Table of non-negative values over assignments to some variables.
+    Variables are ("gene", person) or ("trait", person) pairs, and `table`
+    maps tuples of their values, in order, to numbers.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = table
+
+    def multiply(self, other):
+        variables = self.variables + tuple(
+            v for v in other.variables if v not in self.variables
+        )
+        table = {}
+        for values in itertools.product(
+                *(DOMAINS[kind] for kind, _ in variables)):
+            assignment = dict(zip(variables, values))
+            table[values] = (
+                self.table[tuple(assignment[v] for v in self.variables)] *
+                other.table[tuple(assignment[v] for v in other.variables)]
+            )
+        return Factor(variables, table)
+
+    def sum_out(self, variable):
+        i = self.variables.index(variable)
+        table = {}
+        for values, p in self.table.items():
+            key = values[:i] + values[i + 1:]
+            table[key] = table.get(key, 0) + p
+        return Factor(self.variables[:i] + self.variables[i + 1:], table)
+
+    def project(self, variables):
+        """Sum out every variable not in `variables`."""
+        keep = [i for i, v in enumerate(self.variables) if v in variables]
+        table = {}
+        for values, p in self.table.items():
+            key = tuple(values[i] for i in keep)
+            table[key] = table.get(key, 0) + p
+        return Factor([self.variables[i] for i in keep], table)
+
+    def normalized(self):
+        total = sum(self.table.values())
+        return Factor(self.variables, {
+            values: p / total for values, p in self.table.items()
+        })
+
+
+def product(factors):
+    """
+    Return the product of `factors`, or a factor of no variables worth
+    1 if there are none.
+    """
+    result = Factor([], {(): 1})
+    for factor in factors:
+        result = result.multiply(factor)
+    return result
+
+
+def family_factors(people):
+    """
+    Return the factors whose product is the joint probability of every
+    gene and trait assignment consistent with the known traits.
+    """
+    factors = []
+    for person in people:
+        gene = ("gene", person)
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None and father is None:
+            factors.append(Factor([gene], {
+                (genes,): PROBS["gene"][genes] for genes in DOMAINS["gene"]
+            }))
+        else:
+            factors.append(Factor(
+                [gene, ("gene", mother), ("gene", father)],
+                {
+                    (genes, m, f): inheritance_probability(genes, m, f)
+                    for genes in DOMAINS["gene"]
+                    for m in DOMAINS["gene"]
+                    for f in DOMAINS["gene"]
+                }
+            ))
+
+        # Known traits are evidence, so only their value is kept
+        trait = people[person]["trait"]
+        if trait is None:
+            factors.append(Factor([gene, ("trait", person)], {
+                (genes, t): PROBS["trait"][genes][t]
+                for genes in DOMAINS["gene"] for t in DOMAINS["trait"]
+            }))
+        else:
+            factors.append(Factor([gene], {
+                (genes,): PROBS["trait"][genes][trait]
+                for genes in DOMAINS["gene"]
+            }))
+    return factors
+
+
+def marginals(factors):
+    """
+    Return the normalized marginal factor of every variable of `factors`.
+
+    Eliminating every variable once, in min-fill order, puts each factor
+    in the bucket of its first variable to go, and sends each bucket's
+    product, summed over its variable, to the bucket of the next variable
+    in it to go. Those messages form a tree. Passing messages back down
+    the tree as well leaves each bucket with everything it needs for its
+    variable's marginal, for the cost of two eliminations in all.
+    """
+    order = elimination_order(factors)
+    position = {variable: i for i, variable in enumerate(order)}
+    local = {variable: [] for variable in order}
+    for factor in factors:
+        # Factors of no variables only scale the result
+        if factor.variables:
+            local[min(factor.variables, key=position.get)].append(factor)
+
+    # Upward pass, in elimination order
+    parent = {}
+    children = {variable: [] for variable in order}
+    upward = {}
+    for variable in order:
+        upward[variable] = product(
+            local[variable] + [upward[child] for child in children[variable]]
+        ).sum_out(variable)
+        if upward[variable].variables:
+            parent[variable] = min(upward[variable].variables,
+                                   key=position.get)
+            children[parent[variable]].append(variable)
+
+    # Downward pass, in reverse, so every parent is done before its children
+    downward = {}
+    beliefs = {}
+    for variable in reversed(order):
+        incoming = local[variable] + [upward[child]
+                                      for child in children[variable]]
+        if variable in parent:
+            incoming.append(downward[variable])
+        beliefs[variable] = product(incoming).project({variable}).normalized()
+        for child in children[variable]:
+            others = [f for f in incoming if f is not upward[child]]
+            downward[child] = product(others).project(
+                set(upward[child].variables)
+            )
+    return beliefs
+
+
+def elimination_order(factors):
+    """
+    Return the variables of `factors` in the order min-fill eliminates
+    them: each time, the variable whose elimination connects the fewest
+    pairs of not yet connected variables, breaking ties by fewest
+    neighbors.
+
+    The interaction graph is updated as variables go, and only variables
+    near the eliminated one have their cost recomputed.
+    """
+    neighbors = {}
+    for factor in factors:
+        for variable in factor.variables:
+            neighbors.setdefault(variable, set()).update(factor.variables)
+    for variable in neighbors:
+        neighbors[variable].discard(variable)
+
+    def cost(variable):
+        adjacent = neighbors[variable]
+        fill = sum(
+            1 for a, b in itertools.combinations(adjacent, 2)
+            if b not in neighbors[a]
+        )
+        return (fill, len(adjacent), variable)
+
+    # Heap of costs, where entries no longer in `costs` are stale
+    costs = {v: cost(v) for v in neighbors}
+    heap = list(costs.values())
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        entry = heapq.heappop(heap)
+        variable = entry[-1]
+        if costs.get(variable) != entry:
+            continue
+        del costs[variable]
+        order.append(variable)
+
+        adjacent = neighbors.pop(variable)
+        for a in adjacent:
+            neighbors[a].discard(variable)
+            neighbors[a].update(adjacent - {a})
+
+        # Fill edges change the cost of the neighbors and their neighbors
+        affected = set(adjacent)
+        for a in adjacent:
+            affected.update(neighbors[a])
+        for a in affected:
+            if a in costs:
+                costs[a] = cost(a)
+                heapq.heappush(heap, costs[a])
+    return order
 
 
 def load_data(filename):
@@ -123,14 +859,14 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Generate all possible subsets of set s.
     """
     s = list(s)
-    return [
+    return (
         set(s) for s in itertools.chain.from_iterable(
             itertools.combinations(s, r) for r in range(len(s) + 1)
         )
-    ]
+    )
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
@@ -186,19 +922,50 @@ def joint_probability(people, one_gene, two_genes, have_trait):
     return probability
 
     
-def getGeneFromParent(parent, one_gene, two_genes):
+@functools.lru_cache(maxsize=None)
+def inheritance_probability(genes, mother, father):
     """
-    Returns the probability that a parent will pass on the gene
+    Returns the probability that a child has `genes` copies of the gene
+    given how many copies its mother and father have.
+    Results are cached, as `PROBS` does not change.
     """
-    if parent in one_gene:
+    from_mother = pass_probability(mother)
+    from_father = pass_probability(father)
+    if genes == 2:
+        return from_mother * from_father
+    elif genes == 1:
+        return (from_mother * (1 - from_father) +
+                from_father * (1 - from_mother))
+    else:
+        return (1 - from_mother) * (1 - from_father)
+
+
+def pass_probability(genes):
+    """
+    Returns the probability that a parent with `genes` copies
+    of the gene will pass on the gene
+    """
+    if genes == 1:
         probability = 0.5
-    elif parent in two_genes:
+    elif genes == 2:
         probability = 1 - PROBS["mutation"]
     else:
         probability = PROBS["mutation"]
     return probability
 
 
+def getGeneFromParent(parent, one_gene, two_genes):
+    """
+    Returns the probability that a parent will pass on the gene
+    """
+    if parent in one_gene:
+        return pass_probability(1)
+    elif parent in two_genes:
+        return pass_probability(2)
+    else:
+        return pass_probability(0)
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
@@ -237,5 +1004,22 @@ def normalize(probabilities):
         probabilities[person]["trait"][False] *= factor
 
 
+# Inference algorithms selectable from the command line
+METHODS = {
+    "enumeration": infer_by_enumeration,
+    "lazy": infer_lazily,
+    "vectorized": infer_vectorized,
+    "elimination": infer_by_elimination,
+    "likelihood": infer_by_likelihood_weighting,
+    "gibbs": infer_by_gibbs_sampling
+}
+
+# Sampling methods, as generators of streamed estimates
+SAMPLERS = {
+    "likelihood": likelihood_weighting,
+    "gibbs": gibbs_sampling
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from logic import *
+from sat import Models, sat_check
+
+"""
+Times model checking on generated knights and knaves puzzles, comparing
+tree-walking evaluation, compiled evaluators, the SAT backend and
+one solver answering every query about a knowledge base.
+"""
+
+
+def each(check):
+    """
+    Return a function listing the queries that `check` finds entailed,
+    checking them one at a time.
+    """
+    return lambda knowledge, queries: [
+        query for query in queries if check(knowledge, query)
+    ]
+
+
+# Functions from a knowledge base and queries to the entailed queries
+CHECKERS = {
+    "model_check": each(model_check),
+    "compiled": each(compiled_model_check),
+    "sat": each(sat_check),
+    # Converts the knowledge base once for all the queries
+    "models": lambda knowledge, queries: Models(knowledge).entailed(queries),
+}
+
+
+def random_puzzle(people, statements=2, seed=None, interned=False):
+    """
+    Return (knowledge, symbols) for a puzzle with `people` characters,
+    each a knight or a knave, who each make `statements` statements
+    about the others. The puzzle always has at least one solution.
+    If `interned` is true, every sentence is interned as it is built.
+    """
+    rng = random.Random(seed)
+
+    def make(cls, *parts):
+        return cls.make(*parts) if interned else cls(*parts)
+
+    knights = [make(Symbol, f"P{i} is a Knight") for i in range(people)]
+    knaves = [make(Symbol, f"P{i} is a Knave") for i in range(people)]
+    truth = [rng.random() < 0.5 for _ in range(people)]
+
+    def claim():
+        # "Pi is a knight/knave", "Pi and Pj are the same kind" or
+        # "Pi or Pj is a knave"
+        i, j = rng.sample(range(people), 2)
+        kind = rng.randrange(3)
+        if kind == 0:
+            if rng.random() < 0.5:
+                return knights[i], truth[i]
+            return knaves[i], not truth[i]
+        if kind == 1:
+            return (make(Biconditional, knights[i], knights[j]),
+                    truth[i] == truth[j])
+        return (make(Or, knaves[i], knaves[j]),
+                not (truth[i] and truth[j]))
+
+    conjuncts = []
+    for i in range(people):
+        conjuncts.append(make(Or, knights[i], knaves[i]))
+        conjuncts.append(make(Not, make(And, knights[i], knaves[i])))
+        for _ in range(statements):
+            sentence, value = claim()
+            # Knights only say true things and knaves only false ones
+            if value != truth[i]:
+                sentence = make(Not, sentence)
+            conjuncts.append(make(Implication, knights[i], sentence))
+            conjuncts.append(make(Implication, knaves[i],
+                                  make(Not, sentence)))
+    return make(And, *conjuncts), knights + knaves
+
+
+def allocated(function, *args):
+    """
+    Call `function` and return (result, bytes it allocated that are
+    still in use).
+    """
+    # Free whatever earlier runs left in cycles before measuring
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def random_puzzles(count, people, statements=2, seed=0, interned=False):
+    """
+    Return `count` random puzzles about the same people, interning
+    their sentences as they are built if `interned` is true.
+    """
+    return [random_puzzle(people, statements, seed + i, interned)
+            for i in range(count)]
+
+
+def time_checker(checker, knowledge, symbols):
+    """
+    Check every symbol against the knowledge base and return
+    (seconds, list of entailed symbols).
+    """
+    start = time.perf_counter()
+    entailed = checker(knowledge, symbols)
+    return time.perf_counter() - start, entailed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model checking.")
+    parser.add_argument("--people", type=int, nargs="+", default=[6, 8, 10])
+    parser.add_argument("--checkers", nargs="+", choices=sorted(CHECKERS),
+                        default=sorted(CHECKERS))
+    parser.add_argument("--statements", type=int, default=2,
+                        help="statements each person makes")
+    parser.add_argument("--puzzles", type=int, default=100,
+                        help="puzzles to measure the memory of")
+    parser.add_argument("--intern", action="store_true",
+                        help="check the interned knowledge bases")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    for people in args.people:
+        seed = random.randrange(2 ** 32) if args.seed is None else args.seed
+        puzzles, size = allocated(
+            random_puzzles, args.puzzles, people, args.statements, seed
+        )
+        shared, shared_size = allocated(
+            random_puzzles, args.puzzles, people, args.statements, seed, True
+        )
+        knowledge, symbols = shared[0] if args.intern else puzzles[0]
+        print(f"{people} people, {len(symbols)} symbols, {args.puzzles} "
+              f"knowledge bases {size / 1024:.1f} KiB "
+              f"({shared_size / 1024:.1f} KiB interned)")
+        results = {}
+        for name in args.checkers:
+            seconds, entailed = time_checker(CHECKERS[name], knowledge, symbols)
+            results[name] = entailed
+            print(f"  {name}: {seconds:.4f}s, {len(entailed)} entailed")
+        if len({tuple(map(repr, entailed)) for entailed in results.values()}) > 1:
+            print("  checkers disagree!")
+        # Let go of the interned sentences, so that they drop out of the
+        # tables before the next size is measured. The tables keep the
+        # room they grew to, so run one size at a time for exact figures
+        del puzzles, shared, knowledge, symbols, results
+
+
+if __name__ == "__main__":
+    main()
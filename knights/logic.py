@@ -1,7 +1,48 @@
+import copy
 import itertools
+import weakref
+
+# Compiled expressions nest at most this deep before a subsentence is
+# compiled into a function of its own, as Python's parser only allows
+# about 200 nested parentheses
+MAX_NESTING = 50
 
 
 class Sentence():
+    # Interned sentences are canonical and never change, so they keep
+    # their hash and symbols; other sentences may change. A sentence is
+    # interned exactly when it has a cached hash
+    __slots__ = ("cached_hash", "cached_symbols", "__weakref__")
+
+    def __init__(self):
+        self.cached_hash = None
+        self.cached_symbols = None
+
+    def __hash__(self):
+        if self.cached_hash is not None:
+            return self.cached_hash
+        return self.find_hash()
+
+    @property
+    def interned(self):
+        return self.cached_hash is not None
+
+    def __reduce__(self):
+        # Interned sentences are made again on unpickling, so that they
+        # are the interned ones in the new process too
+        if self.interned:
+            return type(self).make, self.arguments()
+        return type(self), self.arguments()
+
+    def __copy__(self):
+        if self.interned:
+            return self
+        return type(self)(*self.arguments())
+
+    def __deepcopy__(self, memo):
+        if self.interned:
+            return self
+        return type(self)(*copy.deepcopy(self.arguments(), memo))
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -12,8 +53,123 @@ class Sentence():
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozenset of all symbols in the logical sentence."""
+        if self.cached_symbols is not None:
+            return self.cached_symbols
+        symbols = frozenset(self.find_symbols())
+        if self.interned:
+            self.cached_symbols = symbols
+        return symbols
+
+    def find_symbols(self):
+        """Computes the set of all symbols in the logical sentence."""
+        return frozenset()
+
+    def find_hash(self):
+        """Computes the hash of the logical sentence."""
+        raise Exception("nothing to hash")
+
+    def arguments(self):
+        """Returns the arguments the sentence was constructed with."""
+        return self.parts()
+
+    @classmethod
+    def make(cls, *parts):
+        """
+        Returns the interned sentence cls(*parts), making it only if no
+        equal sentence is interned yet, so that equal interned sentences
+        are one object. Parts are interned first.
+        """
+        parts = tuple(intern(part) for part in parts)
+        sentence = cls(*parts)
+        table = interned.setdefault(cls, weakref.WeakValueDictionary())
+
+        # Sentences are keyed by their cached hash, which costs nothing
+        # extra, or by (hash, parts) if another sentence has that hash
+        value = sentence.find_hash()
+        found = table.get(value)
+        if found is None or found.parts() != parts:
+            found = table.get((value, parts))
+        if found is not None:
+            return found
+        sentence.freeze()
+        key = sentence.cached_hash
+        table[key if key not in table else (key, parts)] = sentence
+        return sentence
+
+    def freeze(self):
+        """Marks the sentence as interned, so that it can no longer change."""
+        self.cached_hash = self.find_hash()
+
+    def parts(self):
+        """Returns the sentences this one is made of, in order."""
+        return ()
+
+    def expression(self, bits, parts):
+        """
+        Returns Python source evaluating the logical sentence on an integer
+        `m`, where symbol `name` is true if bit `bits[name]` of m is set,
+        given the source of each of its parts.
+        """
+        raise Exception("nothing to evaluate")
+
+    def compile(self, symbols=None):
+        """
+        Returns a function evaluating the logical sentence on a bit-packed
+        model: an integer whose bit i is the truth value of the i-th name
+        in `symbols` (by default the sentence's symbols, sorted).
+        """
+        if symbols is None:
+            symbols = sorted(self.symbols())
+        bits = {name: i for i, name in enumerate(symbols)}
+
+        # Build the source bottom-up without recursion, so that deep
+        # sentences compile too, keeping each part's (source, height)
+        functions = {}
+        sources = {}
+        stack = [(self, False)]
+        try:
+            while stack:
+                sentence, ready = stack.pop()
+                if id(sentence) in sources:
+                    continue
+                if not ready:
+                    stack.append((sentence, True))
+                    stack.extend((part, False) for part in sentence.parts())
+                    continue
+                parts = []
+                height = 0
+                for part in sentence.parts():
+                    source, part_height = sources[id(part)]
+                    if part_height >= MAX_NESTING:
+                        name = f"f{len(functions)}"
+                        functions[name] = eval(f"lambda m: {source}",
+                                               functions)
+                        source, part_height = f"{name}(m)", 1
+                    parts.append(source)
+                    height = max(height, part_height)
+                sources[id(sentence)] = (
+                    sentence.expression(bits, parts), height + 1
+                )
+            source, _ = sources[id(self)]
+            return eval(f"lambda m: bool({source})", functions)
+        except (SyntaxError, RecursionError, MemoryError):
+            pass
+
+        # Fall back on evaluating the sentence itself
+        def evaluate(m):
+            return self.evaluate({
+                name: bool(m >> i & 1) for i, name in enumerate(symbols)
+            })
+        return evaluate
+
+    @classmethod
+    def both_interned(cls, a, b):
+        """
+        Checks if two sentences are both interned, in which case they are
+        equal only if they are the same object.
+        """
+        return a.interned and b.interned
 
     @classmethod
     def validate(cls, sentence):
@@ -43,16 +199,34 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
     def __init__(self, name):
+        Sentence.__init__(self)
         self.name = name
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (isinstance(other, Symbol)
+                                 and self.name == other.name)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("symbol", self.name))
 
+    def arguments(self):
+        return (self.name,)
+
+    @classmethod
+    def make(cls, name):
+        table = interned.setdefault(cls, weakref.WeakValueDictionary())
+        symbol = table.get(name)
+        if symbol is None:
+            symbol = cls(name)
+            symbol.freeze()
+            table[name] = symbol
+        return symbol
+
     def __repr__(self):
         return self.name
 
@@ -65,19 +239,33 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def find_symbols(self):
+        return frozenset([self.name])
+
+    def expression(self, bits, parts):
+        if self.name not in bits:
+            raise Exception(f"variable {self.name} not in model")
+        return f"(m >> {bits[self.name]} & 1)"
 
 
 class Not(Sentence):
+    __slots__ = ("operand",)
+
     def __init__(self, operand):
         Sentence.validate(operand)
+        Sentence.__init__(self)
         self.operand = operand
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        if self is other:
+            return True
+        return (isinstance(other, Not)
+                and not Sentence.both_interned(self, other)
+                and self.operand == other.operand)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("not", hash(self.operand)))
 
     def __repr__(self):
@@ -89,24 +277,44 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
+    def find_symbols(self):
         return self.operand.symbols()
 
+    def parts(self):
+        return (self.operand,)
+
+    def expression(self, bits, parts):
+        operand, = parts
+        return f"(not {operand})"
+
 
 class And(Sentence):
+    __slots__ = ("conjuncts",)
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
+        Sentence.__init__(self)
         self.conjuncts = list(conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        if self is other:
+            return True
+        return (isinstance(other, And)
+                and not Sentence.both_interned(self, other)
+                and self.parts() == other.parts())
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
         )
 
+    def freeze(self):
+        Sentence.freeze(self)
+        self.conjuncts = tuple(self.conjuncts)
+
     def __repr__(self):
         conjunctions = ", ".join(
             [str(conjunct) for conjunct in self.conjuncts]
@@ -114,6 +322,8 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        if self.interned:
+            raise Exception("cannot add to an interned sentence")
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
 
@@ -126,24 +336,47 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def find_symbols(self):
+        return frozenset().union(
+            *[conjunct.symbols() for conjunct in self.conjuncts]
+        )
+
+    def parts(self):
+        return tuple(self.conjuncts)
+
+    def expression(self, bits, parts):
+        if not parts:
+            return "True"
+        return "(" + " and ".join(parts) + ")"
 
 
 class Or(Sentence):
+    __slots__ = ("disjuncts",)
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
+        Sentence.__init__(self)
         self.disjuncts = list(disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        if self is other:
+            return True
+        return (isinstance(other, Or)
+                and not Sentence.both_interned(self, other)
+                and self.parts() == other.parts())
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
         )
 
+    def freeze(self):
+        Sentence.freeze(self)
+        self.disjuncts = tuple(self.disjuncts)
+
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
@@ -157,23 +390,41 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def find_symbols(self):
+        return frozenset().union(
+            *[disjunct.symbols() for disjunct in self.disjuncts]
+        )
+
+    def parts(self):
+        return tuple(self.disjuncts)
+
+    def expression(self, bits, parts):
+        if not parts:
+            return "False"
+        return "(" + " or ".join(parts) + ")"
 
 
 class Implication(Sentence):
+    __slots__ = ("antecedent", "consequent")
+
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
+        Sentence.__init__(self)
         self.antecedent = antecedent
         self.consequent = consequent
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, Implication)
+                and not Sentence.both_interned(self, other)
                 and self.antecedent == other.antecedent
                 and self.consequent == other.consequent)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("implies", hash(self.antecedent), hash(self.consequent)))
 
     def __repr__(self):
@@ -188,23 +439,38 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def find_symbols(self):
+        return self.antecedent.symbols() | self.consequent.symbols()
+
+    def parts(self):
+        return (self.antecedent, self.consequent)
+
+    def expression(self, bits, parts):
+        antecedent, consequent = parts
+        return f"(not {antecedent} or {consequent})"
 
 
 class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
+        Sentence.__init__(self)
         self.left = left
         self.right = right
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, Biconditional)
+                and not Sentence.both_interned(self, other)
                 and self.left == other.left
                 and self.right == other.right)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def find_hash(self):
         return hash(("biconditional", hash(self.left), hash(self.right)))
 
     def __repr__(self):
@@ -221,8 +487,35 @@ class Biconditional(Sentence):
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def find_symbols(self):
+        return self.left.symbols() | self.right.symbols()
+
+    def parts(self):
+        return (self.left, self.right)
+
+    def expression(self, bits, parts):
+        left, right = parts
+        return f"((not {left}) == (not {right}))"
+
+
+# Interned sentences of each type, each keyed by its hash (symbols by
+# name). An entry costs about 160 bytes besides the sentence itself, so
+# interning saves memory only for sentences shared about three times or
+# more
+interned = {}
+
+
+def intern(sentence):
+    """
+    Returns the interned sentence equal to sentence. Building sentences
+    with make interns them as they are built instead.
+    """
+    Sentence.validate(sentence)
+    if sentence.interned:
+        return sentence
+    if isinstance(sentence, Symbol):
+        return Symbol.make(sentence.name)
+    return type(sentence).make(*sentence.parts())
 
 
 def model_check(knowledge, query):
@@ -257,7 +550,19 @@ def model_check(knowledge, query):
                     check_all(knowledge, query, remaining, model_false))
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set(knowledge.symbols() | query.symbols())
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+def compiled_model_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, enumerating models as
+    integers and evaluating compiled sentences on them.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    knowledge = knowledge.compile(symbols)
+    query = query.compile(symbols)
+    return all(query(m) for m in range(1 << len(symbols)) if knowledge(m))
+
@@ -1,4 +1,5 @@
 from logic import *
+from sat import Models
 
 """
 Shuyan Liu
@@ -6,59 +7,60 @@ CS50's Intro to AI
 06/28/2020
 """
 
-AKnight = Symbol("A is a Knight")
-AKnave = Symbol("A is a Knave")
+AKnight = intern(Symbol("A is a Knight"))
+AKnave = intern(Symbol("A is a Knave"))
 
-BKnight = Symbol("B is a Knight")
-BKnave = Symbol("B is a Knave")
+BKnight = intern(Symbol("B is a Knight"))
+BKnave = intern(Symbol("B is a Knave"))
 
-CKnight = Symbol("C is a Knight")
-CKnave = Symbol("C is a Knave")
+CKnight = intern(Symbol("C is a Knight"))
+CKnave = intern(Symbol("C is a Knave"))
 
 # Rules that are true for all puzzles
 # A person is either a knight or a knave, but not both
-puzzleRules = And(
+# Knowledge bases are interned, so they share identical subsentences
+puzzleRules = intern(And(
     Or(AKnight, AKnave),
     Not(And(AKnight, AKnave)),
     Or(BKnight, BKnave),
     Not(And(BKnight, BKnave)),
     Or(CKnight, CKnave),
     Not(And(CKnight, CKnave)),
-)
+))
 # Puzzle 0
 # A says "I am both a knight and a knave."
-knowledge0 = And(
+knowledge0 = intern(And(
     puzzleRules,
     Implication(AKnight, And(AKnight, AKnave)),
     Implication(AKnave, Not(And(AKnight, AKnave)))
-)
+))
 
 # Puzzle 1
 # A says "We are both knaves."
 # B says nothing.
-knowledge1 = And(
+knowledge1 = intern(And(
     puzzleRules,
     Implication(AKnight, And(AKnave, BKnave)),
     Implication(AKnave, Not(And(AKnave, BKnave)))
-)
+))
 
 # Puzzle 2
 # A says "We are the same kind."
 # B says "We are of different kinds."
-knowledge2 = And(
+knowledge2 = intern(And(
     puzzleRules,
     Implication(AKnight, Or(And(AKnight, BKnight), And(AKnave, BKnave))),
     Implication(AKnave, Not(Or(And(AKnight, BKnight), And(AKnave, BKnave)))),
     Implication(BKnight, Or(And(AKnight, BKnave), And(AKnave, BKnight))),
     Implication(BKnave, Not(Or(And(AKnight, BKnave), And(AKnave, BKnight))))
-)
+))
 
 # Puzzle 3
 # A says either "I am a knight." or "I am a knave.", but you don't know which.
 # B says "A said 'I am a knave'."
 # B says "C is a knave."
 # C says "A is a knight."
-knowledge3 = And(
+knowledge3 = intern(And(
     puzzleRules,
     Implication(AKnight, Or(AKnight, AKnave)),
     Implication(AKnave, Not(Or(AKnight, AKnave))),
@@ -66,7 +68,7 @@ knowledge3 = And(
     Implication(BKnave, Not(And(AKnave, CKnave))),
     Implication(CKnight, AKnight),
     Implication(CKnave, Not(AKnight))
-)
+))
 
 def main():
     symbols = [AKnight, AKnave, BKnight, BKnave, CKnight, CKnave]
@@ -81,9 +83,8 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
-            for symbol in symbols:
-                if model_check(knowledge, symbol):
-                    print(f"    {symbol}")
+            for symbol in Models(knowledge).entailed(symbols):
+                print(f"    {symbol}")
 
 
 if __name__ == "__main__":
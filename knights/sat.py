@@ -0,0 +1,320 @@
+from collections import defaultdict
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+"""
+SAT-based entailment for logic.Sentence trees.
+
+Sentences are converted to CNF with the Tseitin transformation and
+checked by a DPLL solver with unit propagation over watched literals.
+Variables are positive integers, and literals are variables or their
+negations.
+"""
+
+
+class CNF():
+    """
+    Clauses in conjunctive normal form, built up from sentences.
+
+    Every subsentence gets a literal equivalent to it (Tseitin), so the
+    clauses grow linearly with the sentences. Identical subsentences
+    share one literal.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.variables = {}
+        self.literals = {}
+        self.count = 0
+
+    def variable(self, name):
+        """Returns the variable of the symbol called `name`."""
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def new_variable(self):
+        self.count += 1
+        return self.count
+
+    def add(self, sentence):
+        """Adds clauses requiring `sentence` to be true."""
+        self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to `sentence`, adding its definition."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        x = self.new_variable()
+        if isinstance(sentence, And):
+            parts = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            for part in parts:
+                self.clauses.append([-x, part])
+            self.clauses.append([x] + [-part for part in parts])
+        elif isinstance(sentence, Or):
+            parts = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            self.clauses.append([-x] + parts)
+            for part in parts:
+                self.clauses.append([x, -part])
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            b = self.literal(sentence.consequent)
+            self.clauses += [[-x, -a, b], [x, a], [x, -b]]
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            self.clauses += [[-x, -a, b], [-x, a, -b], [x, a, b], [x, -a, -b]]
+        else:
+            raise TypeError("must be a logical sentence")
+        self.literals[sentence] = x
+        return x
+
+
+class Solver():
+    """
+    DPLL satisfiability solver with unit propagation over two watched
+    literals per clause and chronological backtracking.
+    """
+
+    def __init__(self, clauses=()):
+        self.clauses = []
+        self.watches = defaultdict(list)
+        self.units = []
+        self.inconsistent = False
+        self.count = 0
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def add_clause(self, clause):
+        clause = list(dict.fromkeys(clause))
+        # Clauses with both a literal and its negation are always true
+        if any(-literal in clause for literal in clause):
+            return
+        self.count = max([self.count] + [abs(literal) for literal in clause])
+        if len(clause) == 0:
+            self.inconsistent = True
+        elif len(clause) == 1:
+            self.units.append(clause[0])
+        else:
+            index = len(self.clauses)
+            self.clauses.append(clause)
+            self.watches[clause[0]].append(index)
+            self.watches[clause[1]].append(index)
+
+    def solve(self, assumptions=()):
+        """
+        Returns a satisfying model as a dictionary from variables to truth
+        values, with every literal in `assumptions` true, or None if the
+        clauses are unsatisfiable under the assumptions.
+        """
+        self.values = {}
+        self.trail = []
+        # (trail length before, decision literal, already flipped)
+        self.levels = []
+        self.head = 0
+        if self.inconsistent:
+            return None
+
+        for literal in self.units:
+            if not self.force(literal):
+                return None
+        if not self.propagate():
+            return None
+
+        # Assumptions are decisions that are never flipped
+        for literal in assumptions:
+            value = self.value(literal)
+            if value is False:
+                return None
+            if value is None:
+                self.levels.append((len(self.trail), literal, True))
+                self.assign(literal)
+                if not self.propagate():
+                    return None
+
+        while True:
+            variable = self.unassigned()
+            if variable is None:
+                return dict(self.values)
+            self.levels.append((len(self.trail), -variable, False))
+            self.assign(-variable)
+            while not self.propagate():
+                if not self.backtrack():
+                    return None
+
+    def value(self, literal):
+        value = self.values.get(abs(literal))
+        if value is None:
+            return None
+        return value if literal > 0 else not value
+
+    def assign(self, literal):
+        self.values[abs(literal)] = literal > 0
+        self.trail.append(literal)
+
+    def force(self, literal):
+        """Assigns a literal unless it is already set, failing if false."""
+        value = self.value(literal)
+        if value is None:
+            self.assign(literal)
+        return value is not False
+
+    def unassigned(self):
+        for variable in range(1, self.count + 1):
+            if variable not in self.values:
+                return variable
+        return None
+
+    def propagate(self):
+        """
+        Assigns every literal implied by a clause with only one literal
+        left unassigned. Returns False if some clause became false.
+        """
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watchers = self.watches[false]
+            i = 0
+            while i < len(watchers):
+                index = watchers[i]
+                clause = self.clauses[index]
+                # Keep the literal that just became false second
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                other = clause[0]
+                if self.value(other) is True:
+                    i += 1
+                    continue
+
+                # Watch another literal that is not false, if there is one
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(index)
+                        watchers[i] = watchers[-1]
+                        watchers.pop()
+                        break
+                else:
+                    if self.value(other) is False:
+                        return False
+                    self.assign(other)
+                    i += 1
+        return True
+
+    def backtrack(self):
+        """
+        Undoes assignments back to the latest decision not yet flipped
+        and flips it. Returns False if there is none left.
+        """
+        while self.levels:
+            length, literal, flipped = self.levels.pop()
+            for assigned in self.trail[length:]:
+                del self.values[abs(assigned)]
+            del self.trail[length:]
+            self.head = length
+            if not flipped:
+                self.levels.append((length, -literal, True))
+                self.assign(-literal)
+                return True
+        return False
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, by checking that knowledge
+    and the negation of query cannot both be true.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.add(Not(query))
+    return Solver(cnf.clauses).solve() is None
+
+
+class Models():
+    """
+    Answers many entailment and consistency queries about one knowledge
+    base, which is converted to CNF and given to a solver only once.
+
+    Each query is then a solve under an assumption about the literal
+    equivalent to it. Models found along the way are never stored, but
+    which symbols were true and false in them is, so that queries about
+    a symbol that some earlier model already settles need no solving.
+    """
+
+    def __init__(self, knowledge):
+        self.cnf = CNF()
+        self.cnf.add(knowledge)
+        self.solver = Solver(self.cnf.clauses)
+        self.added = len(self.cnf.clauses)
+
+        # Symbols seen true, and seen false, in some model
+        self.seen_true = set()
+        self.seen_false = set()
+        self.satisfiable = self.witness([])
+
+    def entails(self, query):
+        """Checks if every model of the knowledge base satisfies query."""
+        if not self.satisfiable:
+            return True
+        if self.settled(Not(query)):
+            return False
+        return not self.witness([-self.literal(query)])
+
+    def is_consistent(self, query):
+        """Checks if some model of the knowledge base satisfies query."""
+        if not self.satisfiable:
+            return False
+        if self.settled(query):
+            return True
+        return self.witness([self.literal(query)])
+
+    def entailed(self, queries):
+        """Returns the queries entailed by the knowledge base."""
+        return [query for query in queries if self.entails(query)]
+
+    def consistent(self, queries):
+        """Returns the queries consistent with the knowledge base."""
+        return [query for query in queries if self.is_consistent(query)]
+
+    def settled(self, query):
+        """
+        Checks if some model already found satisfies query, when query is
+        a symbol or a negated symbol.
+        """
+        if isinstance(query, Symbol):
+            return query.name in self.seen_true
+        if isinstance(query, Not) and isinstance(query.operand, Symbol):
+            return query.operand.name in self.seen_false
+        return False
+
+    def literal(self, query):
+        """
+        Returns the literal equivalent to query, giving the solver the
+        clauses that define it.
+        """
+        literal = self.cnf.literal(query)
+        for clause in self.cnf.clauses[self.added:]:
+            self.solver.add_clause(clause)
+        self.added = len(self.cnf.clauses)
+        return literal
+
+    def witness(self, assumptions):
+        """
+        Checks if some model satisfies the knowledge base and every literal
+        in `assumptions`, noting the symbols true and false in it.
+        """
+        model = self.solver.solve(assumptions)
+        if model is None:
+            return False
+        for name, variable in self.cnf.variables.items():
+            # Variables in no clause are free, so false will do
+            if model.get(variable, False):
+                self.seen_true.add(name)
+            else:
+                self.seen_false.add(name)
+        return True
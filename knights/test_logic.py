@@ -0,0 +1,127 @@
+import copy
+import gc
+import pickle
+import random
+import unittest
+
+from logic import *
+from test_sat import NAMES, random_sentence
+import puzzle
+
+"""
+Checks compiled sentences against Sentence.evaluate, and that interned
+sentences are shared and never change.
+"""
+
+
+def unpack(m, symbols):
+    """Returns the model dictionary for the bit-packed model `m`."""
+    return {name: bool(m >> i & 1) for i, name in enumerate(symbols)}
+
+
+class TestCompile(unittest.TestCase):
+
+    def test_random_sentences(self):
+        rng = random.Random(3)
+        for _ in range(500):
+            sentence = random_sentence(rng, 4)
+            evaluate = sentence.compile(NAMES)
+            for m in range(1 << len(NAMES)):
+                self.assertEqual(evaluate(m),
+                                 sentence.evaluate(unpack(m, NAMES)))
+
+    def test_deep_sentences(self):
+        a, b = Symbol("A"), Symbol("B")
+        negations = a
+        conjunctions = a
+        for _ in range(300):
+            negations = Not(negations)
+            conjunctions = And(conjunctions, b)
+        for sentence in [negations, conjunctions]:
+            evaluate = sentence.compile(["A", "B"])
+            for m in range(4):
+                self.assertEqual(evaluate(m),
+                                 sentence.evaluate(unpack(m, ["A", "B"])))
+        self.assertTrue(compiled_model_check(conjunctions, a))
+        self.assertEqual(compiled_model_check(negations, a),
+                         model_check(negations, a))
+
+    def test_missing_symbol(self):
+        with self.assertRaises(Exception):
+            Symbol("A").compile(["B"])
+
+
+class TestIntern(unittest.TestCase):
+
+    def test_equal_sentences_are_shared(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            seed = rng.random()
+            sentence = random_sentence(random.Random(seed), 4)
+            copy = random_sentence(random.Random(seed), 4)
+            self.assertIs(intern(sentence), intern(copy))
+            self.assertEqual(intern(sentence), sentence)
+            self.assertEqual(hash(intern(sentence)), hash(sentence))
+
+    def test_make_interns_parts(self):
+        a = Symbol.make("A")
+        self.assertIs(a, intern(Symbol("A")))
+        self.assertIs(Not.make(Symbol("A")), Not.make(a))
+        self.assertIs(And.make(a, Symbol("B")).conjuncts[1], Symbol.make("B"))
+        self.assertIs(Or.make(a, Not(a)), intern(Or(a, Not(a))))
+
+    def test_interned_sentences_do_not_change(self):
+        sentence = And.make(Symbol("A"))
+        with self.assertRaises(Exception):
+            sentence.add(Symbol("B"))
+
+    def test_changed_parts_change_hash(self):
+        # Sentences that are not interned may still change, so those
+        # containing them must not keep an old hash or symbols
+        k = And(Symbol("A"))
+        p = Not(k)
+        before = hash(p)
+        self.assertEqual(p.symbols(), {"A"})
+        k.add(Symbol("B"))
+        self.assertEqual(p, Not(And(Symbol("A"), Symbol("B"))))
+        self.assertEqual(hash(p), hash(Not(And(Symbol("A"), Symbol("B")))))
+        self.assertNotEqual(hash(p), before)
+        self.assertEqual(p.symbols(), {"A", "B"})
+
+    def test_copy(self):
+        knowledge = puzzle.knowledge1
+        self.assertIs(copy.copy(knowledge), knowledge)
+        plain = And(Symbol("A"), Not(Symbol("B")))
+        self.assertIsNot(copy.copy(plain), plain)
+        self.assertEqual(copy.copy(plain), plain)
+
+    def test_deepcopy(self):
+        knowledge = puzzle.knowledge1
+        self.assertIs(copy.deepcopy(knowledge), knowledge)
+        self.assertEqual(copy.deepcopy(knowledge), knowledge)
+        plain = And(Symbol("A"), Not(Symbol("B")))
+        duplicate = copy.deepcopy(plain)
+        self.assertEqual(duplicate, plain)
+        duplicate.add(Symbol("C"))
+        self.assertNotEqual(duplicate, plain)
+
+    def test_pickle(self):
+        for knowledge in [puzzle.knowledge0, puzzle.knowledge1,
+                          puzzle.knowledge2, puzzle.knowledge3]:
+            loaded = pickle.loads(pickle.dumps(knowledge))
+            self.assertIs(loaded, knowledge)
+            self.assertEqual(loaded, knowledge)
+        plain = Implication(Symbol("A"), Or(Symbol("B"), Symbol("C")))
+        loaded = pickle.loads(pickle.dumps(plain))
+        self.assertFalse(loaded.interned)
+        self.assertEqual(loaded, plain)
+        self.assertEqual(hash(loaded), hash(plain))
+
+    def test_unused_sentences_are_dropped(self):
+        intern(Implication(Symbol("Unused"), Symbol("B")))
+        gc.collect()
+        self.assertNotIn("Unused", interned[Symbol])
+
+
+if __name__ == "__main__":
+    unittest.main()
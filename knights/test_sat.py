@@ -0,0 +1,164 @@
+import itertools
+import random
+import unittest
+
+from logic import *
+from sat import CNF, Models, Solver, sat_check
+import puzzle
+
+"""
+Checks the SAT backend against model_check, which enumerates every model
+and serves as the reference.
+"""
+
+NAMES = ["A", "B", "C", "D"]
+
+
+def random_sentence(rng, depth):
+    """
+    Return a random sentence over the symbols in NAMES, at most `depth`
+    connectives deep.
+    """
+    if depth == 0 or rng.random() < 0.3:
+        return Symbol(rng.choice(NAMES))
+    kind = rng.randrange(5)
+    if kind == 0:
+        return Not(random_sentence(rng, depth - 1))
+    if kind == 1:
+        return And(*[random_sentence(rng, depth - 1)
+                     for _ in range(rng.randint(1, 3))])
+    if kind == 2:
+        return Or(*[random_sentence(rng, depth - 1)
+                    for _ in range(rng.randint(1, 3))])
+    if kind == 3:
+        return Implication(random_sentence(rng, depth - 1),
+                           random_sentence(rng, depth - 1))
+    return Biconditional(random_sentence(rng, depth - 1),
+                         random_sentence(rng, depth - 1))
+
+
+class TestSatCheck(unittest.TestCase):
+
+    def test_puzzles(self):
+        symbols = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight,
+                   puzzle.BKnave, puzzle.CKnight, puzzle.CKnave]
+        for knowledge in [puzzle.knowledge0, puzzle.knowledge1,
+                          puzzle.knowledge2, puzzle.knowledge3]:
+            for symbol in symbols:
+                self.assertEqual(sat_check(knowledge, symbol),
+                                 model_check(knowledge, symbol))
+
+    def test_random_sentences(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            knowledge = And(*[random_sentence(rng, 3)
+                              for _ in range(rng.randint(1, 3))])
+            query = random_sentence(rng, 2)
+            with self.subTest(knowledge=knowledge, query=query):
+                self.assertEqual(sat_check(knowledge, query),
+                                 model_check(knowledge, query))
+
+    def test_contradiction_entails_everything(self):
+        a = Symbol("A")
+        self.assertTrue(sat_check(And(a, Not(a)), Symbol("B")))
+
+
+class TestSolver(unittest.TestCase):
+
+    def test_models_satisfy_clauses(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            clauses = [
+                [rng.choice([-1, 1]) * rng.randint(1, 6)
+                 for _ in range(rng.randint(1, 3))]
+                for _ in range(rng.randint(1, 12))
+            ]
+            model = Solver(clauses).solve()
+            satisfiable = any(
+                all(any((literal > 0) == values[abs(literal) - 1]
+                        for literal in clause)
+                    for clause in clauses)
+                for values in itertools.product([False, True], repeat=6)
+            )
+            self.assertEqual(model is not None, satisfiable)
+            if model is not None:
+                for clause in clauses:
+                    self.assertTrue(any(
+                        model.get(abs(literal), False) == (literal > 0)
+                        for literal in clause
+                    ))
+
+    def test_assumptions(self):
+        rng = random.Random(2)
+        for _ in range(300):
+            knowledge = And(*[random_sentence(rng, 3)
+                              for _ in range(rng.randint(1, 3))])
+            cnf = CNF()
+            cnf.add(knowledge)
+            solver = Solver(cnf.clauses)
+            for name in NAMES:
+                if name not in knowledge.symbols():
+                    continue
+                variable = cnf.variable(name)
+                with self.subTest(knowledge=knowledge, name=name):
+                    # Satisfiable with the symbol false exactly when the
+                    # knowledge base does not entail it
+                    model = solver.solve(assumptions=[-variable])
+                    self.assertEqual(model is None,
+                                     model_check(knowledge, Symbol(name)))
+                    if model is not None:
+                        self.assertFalse(model[variable])
+
+                    model = solver.solve(assumptions=[variable])
+                    self.assertEqual(
+                        model is None,
+                        model_check(knowledge, Not(Symbol(name)))
+                    )
+                    if model is not None:
+                        self.assertTrue(model[variable])
+
+    def test_contradictory_assumptions(self):
+        solver = Solver([[1, 2]])
+        self.assertIsNone(solver.solve(assumptions=[1, -1]))
+        self.assertIsNotNone(solver.solve(assumptions=[-1]))
+
+
+class TestModels(unittest.TestCase):
+
+    def test_random_sentences(self):
+        rng = random.Random(4)
+        symbols = [Symbol(name) for name in NAMES + ["E"]]
+        for _ in range(300):
+            knowledge = And(*[random_sentence(rng, 3)
+                              for _ in range(rng.randint(1, 3))])
+            queries = (symbols + [Not(symbol) for symbol in symbols]
+                       + [random_sentence(rng, 2) for _ in range(3)])
+            models = Models(knowledge)
+            with self.subTest(knowledge=knowledge):
+                self.assertEqual(
+                    models.entailed(queries),
+                    [q for q in queries if model_check(knowledge, q)]
+                )
+                self.assertEqual(
+                    models.consistent(queries),
+                    [q for q in queries if not model_check(knowledge, Not(q))]
+                )
+
+    def test_many_symbols(self):
+        # 2^100 assignments are far too many to enumerate
+        symbols = [Symbol(f"P{i}") for i in range(100)]
+        knowledge = And(symbols[0], *[
+            Implication(a, b) for a, b in zip(symbols, symbols[1:])
+        ])
+        models = Models(knowledge)
+        self.assertEqual(models.entailed(symbols), symbols)
+        self.assertEqual(models.consistent([Not(symbols[-1])]), [])
+
+        knowledge = And(*[Or(symbol, Not(symbol)) for symbol in symbols])
+        models = Models(knowledge)
+        self.assertEqual(models.entailed(symbols), [])
+        self.assertEqual(models.consistent(symbols), symbols)
+
+
+if __name__ == "__main__":
+    unittest.main()
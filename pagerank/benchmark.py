@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import pagerank
+
+"""
+Benchmarks crawling, sampling and iterating PageRank on synthetic
+corpora and reports the results as JSON.
+"""
+
+
+def synthetic_corpus(directory, pages, distribution="powerlaw",
+                     mean_links=5, exponent=2.1, seed=None):
+    """
+    Write `pages` HTML files to `directory`, linking to each other.
+
+    With the "uniform" distribution every page has a Poisson number of
+    links to pages chosen uniformly. With "powerlaw" both the number of
+    links on a page and how often a page is linked to follow power laws
+    with the given `exponent`, as on the web.
+    """
+    rng = np.random.default_rng(seed)
+    if distribution == "uniform":
+        degrees = rng.poisson(mean_links, pages)
+        popularity = np.full(pages, 1 / pages)
+    elif distribution == "powerlaw":
+        degrees = rng.zipf(exponent, pages) - 1
+        degrees = np.minimum(degrees * mean_links // max(degrees.mean(), 1),
+                             pages - 1)
+        popularity = 1 / np.arange(1, pages + 1) ** (exponent - 1)
+        popularity = rng.permutation(popularity / popularity.sum())
+    else:
+        raise ValueError(f"unknown distribution {distribution}")
+
+    for page, degree in enumerate(degrees):
+        links = rng.choice(pages, size=int(degree), p=popularity)
+        body = "\n".join(
+            f'<li><a href="{link}.html">Page {link}</a></li>' for link in links
+        )
+        with open(os.path.join(directory, f"{page}.html"), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<body>\n<ul>\n{body}\n</ul>\n"
+                    f"</body>\n</html>\n")
+
+
+def measure(function, *args, **kwargs):
+    """
+    Call `function` and return (result, seconds, peak bytes allocated).
+
+    Tracing allocations slows Python code down many times over, so the
+    call is timed untraced and then repeated under tracemalloc.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark(pages, distribution, samples, damping_factor=pagerank.DAMPING,
+              walkers=1, seed=None, processes=False):
+    """
+    Generate a corpus and time each PageRank stage on it.
+    Return a JSON-serializable dictionary of results.
+    """
+    def crawl():
+        # Build the matrix straight from the compact edge list
+        names, edges = pagerank.crawl_edges(directory, processes=processes)
+        return names, edges, pagerank.LinkMatrix.from_edges(names, edges)
+
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_corpus(directory, pages, distribution, seed=seed)
+        (names, edges, matrix), crawl_seconds, crawl_peak = measure(crawl)
+
+    ranks, sample_seconds, sample_peak = measure(
+        pagerank.sample_pagerank, matrix, damping_factor, samples,
+        seed=seed, walkers=walkers
+    )
+
+    def iterate():
+        residuals = []
+        ranks, iterations = pagerank.power_iterate(matrix, damping_factor,
+                                                   residuals=residuals)
+        return ranks, iterations, residuals
+
+    (exact, iterations, residuals), iterate_seconds, iterate_peak = measure(
+        iterate
+    )
+
+    # Add a link to one page in a hundred and update the ranks from
+    # the previous ones. Diffs apply to crawl dictionaries, so this stage
+    # starts from one
+    corpus = pagerank.edge_corpus(names, edges)
+    rng = np.random.default_rng(seed)
+    diff = {"added_links": [
+        (names[i], names[j])
+        for i, j in rng.integers(len(names), size=(max(pages // 100, 1), 2))
+    ]}
+    previous = matrix.to_dict(exact)
+    _, update_seconds, update_peak = measure(
+        pagerank.incremental_pagerank, corpus, previous, diff, damping_factor
+    )
+    # Comparing with a cold start solves again, so it is not timed
+    _, _, report = pagerank.incremental_pagerank(
+        corpus, previous, diff, damping_factor, compare=True
+    )
+    sample_error = float(np.abs(
+        np.array([ranks[page] for page in names]) - exact
+    ).sum())
+
+    return {
+        "pages": pages,
+        "links": len(edges),
+        "distribution": distribution,
+        "crawl": {"seconds": crawl_seconds, "peak_bytes": crawl_peak,
+                  "processes": processes},
+        "sample": {"seconds": sample_seconds, "peak_bytes": sample_peak,
+                   "samples": samples, "walkers": walkers,
+                   "l1_error": sample_error},
+        "iterate": {"seconds": iterate_seconds, "peak_bytes": iterate_peak,
+                    "iterations": iterations, "residuals": residuals},
+        "incremental": {"seconds": update_seconds, "peak_bytes": update_peak,
+                        "added_links": len(diff["added_links"]), **report},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PageRank.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--distribution", choices=["uniform", "powerlaw"],
+                        default="powerlaw")
+    parser.add_argument("--samples", type=int, default=pagerank.SAMPLES)
+    parser.add_argument("--walkers", type=int, default=1)
+    parser.add_argument("--processes", action="store_true",
+                        help="parse pages on a process pool")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="write the report here, not stdout")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "damping": pagerank.DAMPING,
+        "tolerance": pagerank.TOLERANCE,
+        "runs": [
+            benchmark(pages, args.distribution, args.samples,
+                      walkers=args.walkers, seed=args.seed,
+                      processes=args.processes)
+            for pages in args.pages
+        ],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
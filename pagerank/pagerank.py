@@ -1,8 +1,11 @@
+import json
 import os
-import random
 import re
 import sys
-import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
 
 """
 Shuyan Liu
@@ -13,11 +16,35 @@ CS50's Intro to AI
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Iteration stops once the ranks move less than this in total (L1 norm)
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+# Random surfer steps drawn from the generator at a time
+BATCH = 1024
+
+# Adaptive sampling moves each surfer this many steps a round, and needs
+# a few rounds before their spread says anything about the error. A
+# round is far longer than a surfer takes to forget where it started
+# (about 1 / (1 - DAMPING) steps), and the minimum is well below SAMPLES
+# so that easy corpora stop early
+ROUND_SAMPLES = 250
+MIN_ROUNDS = 10
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from an HTML file at a time, and how many at the end of
+# one read are searched again with the next so links can span reads
+CHUNK_SIZE = 1 << 16
+OVERLAP = 4096
+
 
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    # The matrix is built straight from the compact edge list, so even
+    # large corpora never hold a dictionary of sets
+    corpus = LinkMatrix.from_edges(*crawl_edges(sys.argv[1]))
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -28,31 +55,115 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, workers=None, cache=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
+    return edge_corpus(*crawl_edges(directory, workers, cache))
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
 
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
+def edge_corpus(pages, edges):
+    """
+    Return the `crawl` dictionary of the (pages, edges) returned by
+    `crawl_edges`.
+    """
+    corpus = {page: set() for page in pages}
+    for source, destination in edges.tolist():
+        corpus[pages[source]].add(pages[destination])
+    return corpus
+
+
+def crawl_edges(directory, workers=None, cache=None, processes=False):
+    """
+    Parse a directory of HTML pages on a pool of `workers` threads, or
+    processes if `processes` is true.
+
+    Matching links holds the GIL, so threads only overlap reading files
+    and parse one page at a time. A process pool parses pages in
+    parallel, which pays off once there are many or large pages to parse.
+
+    Return (pages, edges): the sorted page names, and an array with one
+    (source, destination) row of page indices per link between two
+    different pages of the corpus.
+
+    If `cache` names a file, the links found in each page are stored there
+    and reused while the page's modification time and size are unchanged.
+    """
+    pages = sorted(
+        filename for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+
+    cached = {}
+    if cache is not None:
+        try:
+            with open(cache) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+
+    # Reuse the cached links of unchanged pages and parse the rest
+    keys = []
+    found = []
+    stale = []
+    for i, page in enumerate(pages):
+        stat = os.stat(os.path.join(directory, page))
+        key = [stat.st_mtime_ns, stat.st_size]
+        keys.append(key)
+        entry = cached.get(page)
+        if entry is not None and entry[:2] == key:
+            found.append(entry[2])
+        else:
+            found.append(None)
+            stale.append(i)
+
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(workers) as pool:
+        parsed = pool.map(
+            parse_links,
+            [os.path.join(directory, pages[i]) for i in stale],
+            chunksize=16
         )
+        for i, links in zip(stale, parsed):
+            found[i] = sorted(links)
+
+    if cache is not None:
+        with open(cache, "w") as f:
+            json.dump({
+                page: key + [links]
+                for page, key, links in zip(pages, keys, found)
+            }, f)
+
+    # Only include links to other pages in the corpus
+    index = {page: i for i, page in enumerate(pages)}
+    edges = []
+    for i, links in enumerate(found):
+        for link in links:
+            j = index.get(link)
+            if j is not None and j != i:
+                edges.append((i, j))
+    return pages, np.array(edges, dtype=np.int64).reshape(-1, 2)
+
 
-    return pages
+def parse_links(filename):
+    """
+    Return the set of link targets in an HTML file, reading it in chunks
+    rather than all at once.
+    """
+    links = set()
+    tail = ""
+    with open(filename) as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            text = tail + chunk
+            # Links in the overlap are found twice, which the set absorbs
+            links.update(LINK.findall(text))
+            tail = text[-OVERLAP:]
+    return links
 
 
 def transition_model(corpus, page, damping_factor):
@@ -85,77 +196,420 @@ def transition_model(corpus, page, damping_factor):
     return probabilities
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None, walkers=1):
     """
-    Return PageRank values for each page by sampling `n` pages
-    according to transition model, starting with a page at random.
+    Return PageRank values for each page of a `crawl` corpus or
+    `LinkMatrix` by sampling `n` pages according to transition model,
+    starting with a page at random.
+
+    The samples are split between `walkers` independent random surfers
+    that move together, and `seed` makes the walk reproducible.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    pagerank = corpus.copy()
-    for i in pagerank:
-        pagerank[i] = 0
-    # Choose the first page randomly
-    page = random.choice(list(corpus.keys()))
-    pagerank[page] += 1
-    # Choose the following pages with probabilities defined by the transition model
-    for i in range(n-1):
-        probabilities = transition_model(corpus, page, damping_factor)
-        weight = list(probabilities.values())
-        page = random.choices(list(corpus.keys()), weights=weight, cum_weights=None, k=1)
-        page = page[0]
-        pagerank[page] += 1
-    # Normalize the values so they add to 1
-    for i in pagerank:
-        pagerank[i] /= n
-    return pagerank
-
-
-def iterate_pagerank(corpus, damping_factor):
-    """
-    Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    matrix = LinkMatrix.from_corpus(corpus)
+    rng = np.random.default_rng(seed)
+    counts, _ = random_walk(matrix, damping_factor, n, rng, walkers)
+    return matrix.to_dict(counts / n)
+
+
+def random_walk(matrix, damping_factor, n, rng, walkers=1, batch=BATCH,
+                start=None):
+    """
+    Return how often each page of a `LinkMatrix` is visited by `walkers`
+    random surfers taking `n` samples between them, each starting at a
+    random page, along with the page each surfer ends on.
+
+    Given the `start` pages of earlier surfers, carry on their walks
+    instead, with the first sample being a step away from the start.
+
+    Random numbers for `batch` steps are drawn at a time, and each step
+    picks a link with one lookup into the matrix's per-page link table.
+    """
+    pages_count = len(matrix)
+    lengths = np.full(walkers, n // walkers)
+    lengths[:n % walkers] += 1
+    steps = int(lengths.max())
+
+    if start is None:
+        # The first sample is the random starting page itself
+        pages = rng.integers(0, pages_count, walkers)
+        first = 1
+    else:
+        pages = np.asarray(start, dtype=np.int64)
+        first = 0
+    counts = np.zeros(pages_count, dtype=np.int64)
+    if walkers == 1:
+        # One surfer moves faster on plain Python ints than on arrays
+        outdegree = matrix.outdegree.tolist()
+        link_indptr = matrix.link_indptr.tolist()
+        links = matrix.links.tolist()
+        page = int(pages[0])
+    for offset in range(0, steps, batch):
+        size = min(batch, steps - offset)
+        follow = rng.random((size, walkers)) < damping_factor
+        choice = rng.random((size, walkers))
+        jump = rng.integers(0, pages_count, (size, walkers))
+        visited = np.empty((size, walkers), dtype=np.int64)
+        if walkers == 1:
+            trail = []
+            for t, (f, c, j) in enumerate(zip(follow[:, 0].tolist(),
+                                             choice[:, 0].tolist(),
+                                             jump[:, 0].tolist())):
+                if offset + t >= first:
+                    degree = outdegree[page]
+                    if f and degree:
+                        page = links[link_indptr[page] + int(c * degree)]
+                    else:
+                        page = j
+                trail.append(page)
+            visited[:, 0] = trail
+            pages[0] = page
+        else:
+            for t in range(size):
+                if offset + t >= first:
+                    degree = matrix.outdegree[pages]
+                    # Surfers on pages without links always jump at random
+                    link = follow[t] & (degree > 0)
+                    offsets = (choice[t][link] * degree[link]).astype(np.int64)
+                    targets = jump[t].copy()
+                    targets[link] = matrix.links[
+                        matrix.link_indptr[pages[link]] + offsets
+                    ]
+                    pages = targets
+                visited[t] = pages
+        # Walkers with fewer samples stop counting early
+        active = (offset + np.arange(size))[:, None] < lengths
+        counts += np.bincount(visited[active], minlength=pages_count)
+    return counts, pages
+
+
+def t_quantile(p, df):
+    """
+    Return the `p` quantile of Student's t distribution with `df` degrees
+    of freedom, from the Cornish-Fisher expansion around the normal
+    quantile (within 1% for three or more degrees of freedom up to the
+    0.999 quantile, and for nine or more up to the 0.99999 quantile).
+    """
+    z = NormalDist().inv_cdf(p)
+    terms = [
+        (z ** 3 + z) / 4,
+        (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96,
+        (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384,
+        (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3
+         - 945 * z) / 92160,
+    ]
+    return z + sum(term / df ** (i + 1) for i, term in enumerate(terms))
+
+
+def adaptive_sample_pagerank(corpus, damping_factor, epsilon=0.001,
+                             confidence=0.95, max_samples=100 * SAMPLES,
+                             seed=None, walkers=1, round_samples=ROUND_SAMPLES):
+    """
+    Return PageRank values for each page of a `crawl` corpus or
+    `LinkMatrix` by sampling until, with the
+    given `confidence`, every page's estimate is within `epsilon` of its
+    true value at once, or until `max_samples` samples have been drawn.
+
+    Each round moves every surfer `round_samples` steps, with the surfers
+    carrying on between rounds, and the spread of the per-round visit
+    frequencies gives each page's confidence interval (batch means). The
+    intervals of N pages are each at level 1 - (1 - confidence) / N, so
+    that they hold together (Bonferroni).
+
+    Return (ranks, errors, samples): the PageRank dictionary, a dictionary
+    of each page's confidence interval half-width, and the samples drawn.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    rng = np.random.default_rng(seed)
+
+    # Running mean and sum of squared deviations of the round frequencies
+    mean = np.zeros(len(matrix))
+    squares = np.zeros(len(matrix))
+    errors = np.full(len(matrix), np.inf)
+    level = 1 - (1 - confidence) / len(matrix)
+    size = round_samples * walkers
+    rounds = 0
+    pages = None
+    while rounds * size < max_samples:
+        counts, pages = random_walk(matrix, damping_factor, size,
+                                    rng, walkers, start=pages)
+        frequencies = counts / size
+        rounds += 1
+        delta = frequencies - mean
+        mean += delta / rounds
+        squares += delta * (frequencies - mean)
+
+        if rounds >= MIN_ROUNDS:
+            # Few rounds give a rough spread, so widen the interval to
+            # Student's t
+            t = t_quantile((1 + level) / 2, rounds - 1)
+            errors = t * np.sqrt(squares / (rounds - 1) / rounds)
+            if errors.max() <= epsilon:
+                break
+
+    return (matrix.to_dict(mean), matrix.to_dict(errors), rounds * size)
+
+
+def iterate_pagerank(corpus, damping_factor,
+                     tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page of a `crawl` corpus or
+    `LinkMatrix` by iteratively updating PageRank values until
+    convergence.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    pagerank = corpus.copy()
-    totalPages = len(corpus)
-    # Assign initial pageranks
-    for i in pagerank:
-        pagerank[i] = 1 / totalPages
-    # If a page has no links, then it can be interpreted as having links to every page, including itself
-    for page in corpus:
-        if len(corpus[page]) == 0:
-            corpus[page] = corpus.keys()
-    newPagerank = pagerank.copy()
-    isConvergent = False
-    while not isConvergent:
-        pagerank = newPagerank.copy()
-        for page in corpus:
-            links = set()
-            # Add all pages that link to the current page
-            for i in corpus:
-                if page in corpus[i]:
-                    links.add(i)
-            # Calculation for the summation part of the formula
-            count = 0
-            for i in links:
-                numLinks = len(corpus[i])
-                count += pagerank[i] / numLinks
-            # Assign new values with formula
-            newPagerank[page] = ((1 - damping_factor) / totalPages) + (damping_factor * count)
-        flag = True
-        # If all values are within 0.001 of those of the previous pagerank, then it is convergent
-        for page in corpus:
-            if math.fabs(pagerank[page] - newPagerank[page]) > 0.001:
-                flag = False
-        if flag:
-            isConvergent = True
-    return pagerank
+    matrix = LinkMatrix.from_corpus(corpus)
+    ranks, _ = power_iterate(matrix, damping_factor, tolerance=tolerance,
+                             max_iterations=max_iterations)
+    return matrix.to_dict(ranks)
+
+
+def apply_diff(corpus, diff):
+    """
+    Return a copy of `corpus` with a diff applied. The diff is a dictionary
+    that may hold lists under "added_pages", "removed_pages" (page names),
+    "added_links" and "removed_links" ((page, link) pairs).
+
+    Links to removed pages are dropped, as are added links to pages
+    that are not in the corpus.
+    """
+    removed_pages = set(diff.get("removed_pages", ()))
+    updated = {
+        page: set(links) - removed_pages
+        for page, links in corpus.items()
+        if page not in removed_pages
+    }
+    for page in diff.get("added_pages", ()):
+        updated.setdefault(page, set())
+    for page, link in diff.get("removed_links", ()):
+        if page in updated:
+            updated[page].discard(link)
+    for page, link in diff.get("added_links", ()):
+        if page in updated and link in updated and link != page:
+            updated[page].add(link)
+    return updated
+
+
+def incremental_pagerank(corpus, ranks, diff, damping_factor,
+                         tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                         compare=False):
+    """
+    Return PageRank values after applying `diff` (see `apply_diff`) to a
+    corpus whose previous PageRank values were `ranks`, starting the
+    iteration from those values instead of from uniform ranks.
+
+    Return (corpus, ranks, report): the updated corpus, its PageRank
+    dictionary, and a dictionary with the number of iterations taken.
+    If `compare`, the report also holds the iterations a cold start
+    takes and how many the warm start saved; this solves the corpus a
+    second time, so it is meant for benchmarks.
+    """
+    updated = apply_diff(corpus, diff)
+    matrix = LinkMatrix.from_corpus(updated)
+
+    # New pages start from the rank every page would have uniformly
+    start = np.array([ranks.get(page, 1 / len(matrix)) for page in matrix.pages])
+    result, iterations = power_iterate(matrix, damping_factor, start=start,
+                                       tolerance=tolerance,
+                                       max_iterations=max_iterations)
+    report = {"iterations": iterations}
+    if compare:
+        _, cold = power_iterate(matrix, damping_factor, tolerance=tolerance,
+                                max_iterations=max_iterations)
+        report["cold_iterations"] = cold
+        report["saved_iterations"] = cold - iterations
+    return updated, matrix.to_dict(result), report
+
+
+def personalized_pagerank(corpus, seed_sets, damping_factor,
+                          tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Generate personalized PageRank values of a `crawl` corpus or
+    `LinkMatrix` for many seed sets at once.
+
+    Each seed set is a collection of pages the random surfer teleports
+    to (and leaves dangling pages for) with equal probability, or a
+    dictionary weighting those pages. All sets are solved together, one
+    sparse matrix times a matrix of rank vectors per iteration.
+
+    Yield (i, ranks) as the ranks of the i-th seed set converge, where
+    ranks is a dictionary like the one `iterate_pagerank` returns.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    teleport = np.zeros((len(matrix), len(seed_sets)))
+    for i, seeds in enumerate(seed_sets):
+        weights = seeds if isinstance(seeds, dict) else dict.fromkeys(seeds, 1)
+        for page, weight in weights.items():
+            if page not in matrix.index:
+                raise ValueError(f"seed page {page} is not in the corpus")
+            teleport[matrix.index[page], i] = weight
+        total = teleport[:, i].sum()
+        if total <= 0:
+            raise ValueError(f"seed set {i} has no weight")
+        teleport[:, i] /= total
+
+    for i, ranks in power_iterate_many(matrix, damping_factor, teleport,
+                                       tolerance, max_iterations):
+        yield i, matrix.to_dict(ranks)
+
+
+def power_iterate_many(matrix, damping_factor, teleport,
+                       tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Solve for the PageRank vectors of a `LinkMatrix` for every column of
+    a teleport matrix at once, by power iteration.
+
+    Yield (column, ranks) for each column as soon as its iteration changes
+    by less than `tolerance` in L1 norm, and then stop iterating it.
+    Columns still moving after `max_iterations` are yielded last.
+    """
+    active = np.arange(teleport.shape[1])
+    ranks = teleport.copy()
+    iterations = 0
+    while active.size and iterations < max_iterations:
+        iterations += 1
+        dangling = ranks[matrix.dangling].sum(axis=0)
+        new = (damping_factor * (matrix.multiply(ranks) + teleport * dangling)
+               + (1 - damping_factor) * teleport)
+        residual = np.abs(new - ranks).sum(axis=0)
+        ranks = new
+
+        converged = residual < tolerance
+        for column in np.flatnonzero(converged):
+            yield int(active[column]), ranks[:, column]
+        ranks = ranks[:, ~converged]
+        teleport = teleport[:, ~converged]
+        active = active[~converged]
+
+    for column, i in enumerate(active):
+        yield int(i), ranks[:, column]
+
+
+class LinkMatrix():
+    """
+    Sparse column-stochastic link matrix of a corpus.
+
+    Pages are numbered in corpus order. Links are stored grouped by the
+    page they point to (CSR by destination): the pages linking to page `j`
+    are `sources[indptr[j]:indptr[j + 1]]`, and the pages page `i` links
+    to are `links[link_indptr[i]:link_indptr[i + 1]]`.
+    """
+
+    def __init__(self, pages, sources, destinations):
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        n = len(self.pages)
+
+        sources = np.asarray(sources, dtype=np.int64)
+        destinations = np.asarray(destinations, dtype=np.int64)
+        order = np.argsort(destinations, kind="stable")
+        self.sources = sources[order]
+        counts = np.bincount(destinations, minlength=n)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+
+        self.outdegree = np.bincount(sources, minlength=n)
+        # Links grouped by the page they are on, for random surfers
+        self.links = destinations[np.argsort(sources, kind="stable")]
+        self.link_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self.outdegree, out=self.link_indptr[1:])
+        # Pages without links are treated as linking to every page
+        self.dangling = self.outdegree == 0
+        self.weights = 1 / self.outdegree[self.sources]
+        self.linked = np.flatnonzero(counts)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build the matrix of a `crawl` corpus, ignoring links
+        to pages outside the corpus. A matrix is returned as it is.
+        """
+        if isinstance(corpus, LinkMatrix):
+            return corpus
+        index = {page: i for i, page in enumerate(corpus)}
+        sources, destinations = [], []
+        for page, links in corpus.items():
+            for link in links:
+                if link in index:
+                    sources.append(index[page])
+                    destinations.append(index[link])
+        return cls(corpus, sources, destinations)
+
+    @classmethod
+    def from_edges(cls, pages, edges):
+        """
+        Build the matrix from the (pages, edges) returned by `crawl_edges`.
+        """
+        return cls(pages, edges[:, 0], edges[:, 1])
+
+    def __len__(self):
+        return len(self.pages)
+
+    def multiply(self, ranks):
+        """
+        Return the rank each page receives through links from the pages
+        linking to it, for a vector (or matrix of column vectors) of ranks.
+        """
+        contributions = ranks[self.sources]
+        if ranks.ndim == 1:
+            contributions = contributions * self.weights
+        else:
+            contributions = contributions * self.weights[:, None]
+        received = np.zeros_like(ranks)
+        if len(self.linked):
+            received[self.linked] = np.add.reduceat(
+                contributions, self.indptr[self.linked], axis=0
+            )
+        return received
+
+    def to_dict(self, ranks):
+        """
+        Return a dictionary mapping each page to its rank in `ranks`.
+        """
+        return dict(zip(self.pages, ranks.tolist()))
+
+
+def power_iterate(matrix, damping_factor, start=None,
+                  tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                  residuals=None):
+    """
+    Solve for the PageRank vector of a `LinkMatrix` by power iteration,
+    starting from `start` (uniform by default).
+
+    The rank of dangling pages is spread over all pages analytically
+    rather than by adding links. Stops once an iteration changes the ranks
+    by less than `tolerance` in L1 norm, or after `max_iterations`.
+    If `residuals` is a list, each iteration's L1 change is appended to it.
+    Return (ranks, iterations).
+    """
+    n = len(matrix)
+    if n == 0:
+        return np.zeros(0), 0
+    if start is None:
+        ranks = np.full(n, 1 / n)
+    else:
+        ranks = np.asarray(start, dtype=float)
+        ranks = ranks / ranks.sum()
+
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+        dangling = ranks[matrix.dangling].sum()
+        new = (damping_factor * (matrix.multiply(ranks) + dangling / n)
+               + (1 - damping_factor) / n)
+        residual = np.abs(new - ranks).sum()
+        ranks = new
+        if residuals is not None:
+            residuals.append(float(residual))
+        if residual < tolerance:
+            break
+    return ranks, iterations
 
 
 if __name__ == "__main__":